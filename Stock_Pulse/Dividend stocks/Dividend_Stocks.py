@@ -9,6 +9,8 @@ from selenium import webdriver
 import cx_Oracle
 import requests
 
+from report_renderer import render_table
+
 def get_data():
     print('Dividend stock extract process started')
     ## Connect to data base using beautiful soup
@@ -182,28 +184,11 @@ def call_db_prc():
 #     print("Email sent successfully.")
 
 def generate_html_table(data):
-    # Generate the opening tag for the table
-    table_html = "<table border='1'>\n"
-
-    # Generate the header row
-    table_html += "    <tr>\n"
-    table_html += "        <th>Company</th>\n"
-    table_html += "        <th>Status</th>\n"
-    table_html += "        <th>Start Date</th>\n"
-    table_html += "        <th>End Date</th>\n"
-    table_html += "    </tr>\n"
-
-    # Generate table rows based on the provided data
-    for row in data:
-        table_html += "    <tr>\n"
-        for value in row:
-            table_html += f"        <td>{value}</td>\n"
-        table_html += "    </tr>\n"
-
-    # Generate the closing tag for the table
-    table_html += "</table>"
-
-    return table_html
+    # Shared renderer from zerodha_connect (CSS classes, linear-time join)
+    return render_table(
+        list(data),
+        columns=["Company", "Status", "Start Date", "End Date"]
+    )
 
 def send_automail():
     import smtplib
@@ -0,0 +1,296 @@
+####################################################################
+
+# Last modified: 18/10/2026
+# DB: dev
+# Description: Vectorized replacement for
+#              PKG_STOCK_PULSE_ANALYSE.PRC_SP_FIBO_ANALYS.
+#              Loads NSE_STOCK_HISTORY once into NumPy arrays, computes
+#              high/low, STATUS, Fibonacci levels, SMA/EMA/RSI and
+#              52-week bands for every stock in one pass and rewrites
+#              SP_STOCK_ANALYSIS with a single executemany.
+#              New indicator columns: Database/SP_STOCK_ANALYSIS_indicators.sql
+####################################################################
+import time
+
+import cx_Oracle
+import numpy as np
+
+DB_DSN = 'dev/dev@localhost:1521/xe'
+
+# Column that orders NSE_STOCK_HISTORY rows in time
+HISTORY_DATE_COLUMN = 'CREATED_DATE'
+
+FIBO_RATIOS = np.array([0.236, 0.382, 0.500, 0.618, 0.786])
+
+SMA_WINDOWS = (20, 50, 200)
+
+EMA_SPANS = (20, 50)
+
+RSI_PERIOD = 14
+
+# Trading days in a year, for the 52-week bands
+BAND_WINDOW = 252
+
+OUTPUT_COLUMNS = [
+    'STOCK_NAME', 'LTP', 'HIGH_52_WEEKS', 'LOW_52_WEEKS', 'HIGH', 'LOW', 'STATUS',
+    'FIBO_LEVEL_1', 'FIBO_LEVEL_2', 'FIBO_LEVEL_3', 'FIBO_LEVEL_4', 'FIBO_LEVEL_5',
+    'SMA_20', 'SMA_50', 'SMA_200', 'EMA_20', 'EMA_50', 'RSI_14',
+    'BAND_52W_HIGH', 'BAND_52W_LOW', 'BAND_52W_POSITION',
+]
+
+
+# ------------------ Array helpers ------------------ #
+def history_matrix(stock_names, closes, universe):
+    """
+    Turn history rows (in date order within each stock) into a
+    [stock, day] matrix in `universe` order, right-aligned so the latest
+    close of every stock is in the last column; shorter histories are
+    padded with NaN on the left.
+    """
+    index = {name: position for position, name in enumerate(universe)}
+
+    rows = np.array([index.get(name, -1) for name in stock_names], dtype=np.int64)
+    closes = np.asarray(closes, dtype=np.float64)
+
+    keep = rows >= 0
+    rows, closes = rows[keep], closes[keep]
+
+    # Group rows by their position in the universe (which has its own
+    # order); the stable sort keeps each stock's rows in date order
+    order = np.argsort(rows, kind='stable')
+    rows, closes = rows[order], closes[order]
+
+    counts = np.bincount(rows, minlength=len(universe))
+    width = int(counts.max()) if len(counts) else 0
+
+    matrix = np.full((len(universe), max(width, 1)), np.nan)
+
+    if len(rows):
+        # Position of each row inside its stock's run, then shift right
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        offsets = np.arange(len(rows)) - starts[rows]
+        matrix[rows, width - counts[rows] + offsets] = closes
+
+    return matrix
+
+
+def last_window(matrix, window):
+    return matrix[:, -window:] if matrix.shape[1] >= window else matrix
+
+
+def row_extreme(reduce, values):
+    # nanmax / nanmin per stock; NaN for stocks with no history
+    present = ~np.all(np.isnan(values), axis=1)
+    result = np.full(len(values), np.nan)
+    if present.any():
+        result[present] = reduce(values[present], axis=1)
+    return result
+
+
+def sma(matrix, window):
+    values = last_window(matrix, window)
+    counts = np.sum(~np.isnan(values), axis=1)
+    totals = np.nansum(values, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts >= window, totals / counts, np.nan)
+
+
+def ema(matrix, span):
+    # Seeded with the first close, computed across all stocks per day
+    alpha = 2.0 / (span + 1)
+    result = np.full(len(matrix), np.nan)
+    for column in matrix.T:
+        present = ~np.isnan(column)
+        seeded = present & np.isnan(result)
+        result = np.where(seeded, column, result)
+        update = present & ~seeded
+        result = np.where(update, alpha * column + (1 - alpha) * result, result)
+    return result
+
+
+def rsi(matrix, period=RSI_PERIOD):
+    # Wilder's RSI on close-to-close changes
+    changes = np.diff(matrix, axis=1)
+    gains = np.where(changes > 0, changes, 0.0)
+    losses = np.where(changes < 0, -changes, 0.0)
+    valid = ~np.isnan(changes)
+
+    seen = np.cumsum(valid, axis=1)
+    average_gain = np.zeros(len(matrix))
+    average_loss = np.zeros(len(matrix))
+
+    for column in range(changes.shape[1]):
+        count = seen[:, column]
+        step = valid[:, column]
+        # Simple mean for the first `period` changes, smoothing afterwards
+        divisor = np.where(count <= period, np.maximum(count, 1), period)
+        average_gain = np.where(step, average_gain + (gains[:, column] - average_gain) / divisor, average_gain)
+        average_loss = np.where(step, average_loss + (losses[:, column] - average_loss) / divisor, average_loss)
+
+    count = seen[:, -1] if changes.shape[1] else np.zeros(len(matrix))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        strength = average_gain / average_loss
+        values = np.where(average_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + strength))
+    return np.where(count >= period, values, np.nan)
+
+
+def trend_status(ltp, high, high_52_weeks, low_52_weeks):
+    # Same CASE order as PRC_SP_FIBO_ANALYS (NULL comparisons are false)
+    with np.errstate(invalid='ignore'):
+        conditions = [
+            ltp >= high,
+            ltp <= high,
+            ltp >= high_52_weeks,
+            ltp <= low_52_weeks,
+        ]
+    choices = ['MOVING', 'BELOW LAST HIGH', 'TRENDING - ABOVE 52W', 'FALLING - BELOW 52W']
+    return np.select(conditions, choices, default='')
+
+
+def analyse(universe, ltp, high_52_weeks, low_52_weeks, matrix):
+    """
+    Every SP_STOCK_ANALYSIS column for the whole universe, as arrays.
+    """
+    ltp = np.asarray(ltp, dtype=np.float64)
+    high_52_weeks = np.asarray(high_52_weeks, dtype=np.float64)
+    low_52_weeks = np.asarray(low_52_weeks, dtype=np.float64)
+
+    # HIGH / LOW over the full history, as the correlated subqueries did
+    high = row_extreme(np.nanmax, matrix)
+    low = row_extreme(np.nanmin, matrix)
+
+    band = last_window(matrix, BAND_WINDOW)
+    band_high = row_extreme(np.nanmax, band)
+    band_low = row_extreme(np.nanmin, band)
+    band_range = band_high - band_low
+    with np.errstate(invalid='ignore', divide='ignore'):
+        band_position = np.where(band_range > 0, (ltp - band_low) / band_range * 100.0, np.nan)
+
+    price_move = high_52_weeks - low_52_weeks
+    fibo = low_52_weeks[:, None] + FIBO_RATIOS[None, :] * price_move[:, None]
+
+    columns = {
+        'STOCK_NAME': np.asarray(universe, dtype=object),
+        'LTP': ltp,
+        'HIGH_52_WEEKS': high_52_weeks,
+        'LOW_52_WEEKS': low_52_weeks,
+        'HIGH': high,
+        'LOW': low,
+        'STATUS': trend_status(ltp, high, high_52_weeks, low_52_weeks),
+    }
+
+    for level in range(len(FIBO_RATIOS)):
+        columns[f'FIBO_LEVEL_{level + 1}'] = fibo[:, level]
+
+    for window in SMA_WINDOWS:
+        columns[f'SMA_{window}'] = sma(matrix, window)
+
+    for span in EMA_SPANS:
+        columns[f'EMA_{span}'] = ema(matrix, span)
+
+    columns[f'RSI_{RSI_PERIOD}'] = rsi(matrix)
+    columns['BAND_52W_HIGH'] = band_high
+    columns['BAND_52W_LOW'] = band_low
+    columns['BAND_52W_POSITION'] = band_position
+
+    return columns
+
+
+def to_rows(columns):
+    # Bind rows for executemany; NaN / empty STATUS become NULL
+    lists = []
+    for name in OUTPUT_COLUMNS:
+        values = columns[name]
+        if values.dtype == object or values.dtype.kind == 'U':
+            lists.append([value if value != '' else None for value in values.tolist()])
+        else:
+            lists.append([None if value != value else round(value, 4) for value in values.tolist()])
+    return list(zip(*lists))
+
+
+class FiboAnalysis:
+    def __init__(self):
+        self.connection = None
+
+    # ------------------ Database Connection ------------------ #
+    def connect_to_database(self):
+        try:
+            self.connection = cx_Oracle.connect(DB_DSN)
+            return self.connection
+        except cx_Oracle.Error as e:
+            print(f"Oracle database error: {e}")
+            return None
+
+    # ------------------ Load ------------------ #
+    def load(self):
+        cursor = self.connection.cursor()
+        cursor.arraysize = 50000
+
+        cursor.execute("SELECT STOCK_NAME, PREVIOUS_CLOSE, HIGH_52_WEEKS, LOW_52_WEEKS FROM NSE_STOCK_LIST")
+        stocks = cursor.fetchall()
+
+        universe = [row[0] for row in stocks]
+        ltp = [np.nan if row[1] is None else row[1] for row in stocks]
+        high_52_weeks = [np.nan if row[2] is None else row[2] for row in stocks]
+        low_52_weeks = [np.nan if row[3] is None else row[3] for row in stocks]
+
+        cursor.execute(
+            f"SELECT STOCK_NAME, PREVIOUS_CLOSE FROM NSE_STOCK_HISTORY "
+            f"WHERE PREVIOUS_CLOSE IS NOT NULL ORDER BY STOCK_NAME, {HISTORY_DATE_COLUMN}"
+        )
+        history = cursor.fetchall()
+        cursor.close()
+
+        names = [row[0] for row in history]
+        closes = [row[1] for row in history]
+
+        print(f"Loaded {len(universe)} stocks and {len(history)} history rows")
+
+        return universe, ltp, high_52_weeks, low_52_weeks, history_matrix(names, closes, universe)
+
+    # ------------------ Store ------------------ #
+    def store(self, columns):
+        rows = to_rows(columns)
+
+        cursor = self.connection.cursor()
+        cursor.execute("DELETE FROM SP_STOCK_ANALYSIS")
+        cursor.executemany(
+            f"INSERT INTO SP_STOCK_ANALYSIS ({', '.join(OUTPUT_COLUMNS)}) "
+            f"VALUES ({', '.join(':' + str(position + 1) for position in range(len(OUTPUT_COLUMNS)))})",
+            rows
+        )
+        self.connection.commit()
+        cursor.close()
+
+        print(f"Stored {len(rows)} rows in SP_STOCK_ANALYSIS")
+
+    # ------------------ Run ------------------ #
+    def run(self):
+        if not self.connect_to_database():
+            return
+
+        try:
+            started = time.perf_counter()
+            universe, ltp, high_52_weeks, low_52_weeks, matrix = self.load()
+            loaded = time.perf_counter()
+
+            columns = analyse(universe, ltp, high_52_weeks, low_52_weeks, matrix)
+            computed = time.perf_counter()
+
+            self.store(columns)
+            print(
+                f"Fibo analysis done in {time.perf_counter() - started:.2f}s "
+                f"(load {loaded - started:.2f}s, compute {computed - loaded:.2f}s)"
+            )
+
+        except cx_Oracle.Error as e:
+            self.connection.rollback()
+            print(f"Oracle database error: {e}")
+
+        finally:
+            self.connection.close()
+
+
+# ------------------ Main Execution ------------------ #
+if __name__ == "__main__":
+    FiboAnalysis().run()
@@ -0,0 +1,17 @@
+-- Indicator columns written by Analysis/fibo_analysis.py, the vectorized
+-- replacement for PKG_STOCK_PULSE_ANALYSE.PRC_SP_FIBO_ANALYS.
+
+ALTER TABLE SP_STOCK_ANALYSIS ADD (
+    SMA_20              NUMBER,
+    SMA_50              NUMBER,
+    SMA_200             NUMBER,
+    EMA_20              NUMBER,
+    EMA_50              NUMBER,
+    RSI_14              NUMBER,
+    BAND_52W_HIGH       NUMBER,
+    BAND_52W_LOW        NUMBER,
+    BAND_52W_POSITION   NUMBER
+);
+
+-- The history load reads each stock's closes in date order.
+CREATE INDEX IX_NSE_STOCK_HISTORY_NAME_DATE ON NSE_STOCK_HISTORY (STOCK_NAME, CREATED_DATE);
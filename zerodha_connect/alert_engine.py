@@ -0,0 +1,539 @@
+"""
+alert_engine.py
+
+Price alert rules evaluated on every price update.
+
+Every rule is turned into a price level for its symbol and kept in
+sorted lists, one for levels that act when the price moves up through
+them and one for levels that act when it moves down. A price update from
+p0 to p1 only visits the entries between p0 and p1 (O(log N + k)), so the
+cost does not grow with the number of rules that were not crossed.
+
+Rules supported, per symbol or for every position in the portfolio:
+
+    price_above / price_below   absolute price crosses a level
+    target / stop               same, named for exit levels
+    pct_from_average            % away from the position's average price
+    day_change                  % away from the previous close
+    portfolio_pnl               total portfolio P&L % (symbol PORTFOLIO)
+
+A rule fires once when its level is crossed and re-arms only after the
+price moved back past the level by `hysteresis` (a fraction of the
+level), and alerts for a rule are suppressed for `cooldown` seconds
+after it last fired, so prices hovering at a level do not flap.
+"""
+
+import itertools
+import math
+import threading
+import time
+
+from sortedcontainers import SortedList
+
+
+PORTFOLIO = "PORTFOLIO"
+
+ABOVE = "above"
+
+BELOW = "below"
+
+# kind -> direction for kinds with a fixed direction
+FIXED_DIRECTIONS = {
+    "price_above": ABOVE,
+    "target": ABOVE,
+    "price_below": BELOW,
+    "stop": BELOW,
+}
+
+KINDS = ("price_above", "price_below", "target", "stop", "pct_from_average", "day_change", "portfolio_pnl")
+
+DEFAULT_HYSTERESIS = 0.005
+
+DEFAULT_COOLDOWN = 300.0
+
+INF = math.inf
+
+
+class AlertRule:
+
+    def __init__(self, rule_id, symbol, kind, value, direction=None, hysteresis=DEFAULT_HYSTERESIS,
+                 cooldown=DEFAULT_COOLDOWN, message=None, template=None):
+
+        if kind not in KINDS:
+            raise ValueError(f"Unknown alert rule kind: {kind}")
+
+        direction = direction or FIXED_DIRECTIONS.get(kind) or (ABOVE if value >= 0 else BELOW)
+
+        if direction not in (ABOVE, BELOW):
+            raise ValueError(f"Alert direction must be '{ABOVE}' or '{BELOW}'.")
+
+        self.rule_id = rule_id
+
+        self.symbol = symbol
+
+        self.kind = kind
+
+        self.value = value
+
+        self.direction = direction
+
+        self.hysteresis = hysteresis
+
+        self.cooldown = cooldown
+
+        self.message = message
+
+        # Id of the portfolio-wide rule this one was expanded from.
+        self.template = template
+
+        self.level = None
+
+        self.armed = True
+
+        self.last_fired = None
+
+        self.suppressed = 0
+
+    # ---------------------------------------------------
+
+    def band(self):
+
+        return abs(self.level) * self.hysteresis
+
+    # ---------------------------------------------------
+
+    def describe(self):
+
+        return {
+            "rule_id": self.rule_id,
+            "symbol": self.symbol,
+            "kind": self.kind,
+            "value": self.value,
+            "direction": self.direction,
+            "level": self.level,
+            "armed": self.armed,
+            "last_fired": self.last_fired,
+            "suppressed": self.suppressed,
+        }
+
+
+class _SymbolIndex:
+    """
+    Sorted trigger levels of one symbol. Entries are
+    (level, sequence, rule_id); `up` entries act when the price rises
+    to or through the level, `down` entries when it falls to or through it.
+    """
+
+    def __init__(self):
+
+        self.up = SortedList()
+
+        self.down = SortedList()
+
+        self.price = None
+
+        # rule_id -> the entry currently indexed for it
+        self.entries = {}
+
+
+class AlertEngine:
+
+    def __init__(self, on_alert=None):
+
+        self.rules = {}
+
+        self.templates = {}
+
+        self.positions = {}
+
+        self.indexes = {}
+
+        self.on_alert = on_alert
+
+        self.ids = itertools.count(1)
+
+        self.sequence = itertools.count()
+
+        self.lock = threading.RLock()
+
+        self.invested_value = 0.0
+
+        self.current_value = 0.0
+
+    # ---------------------------------------------------
+
+    def add_rule(self, symbol, kind, value, **options):
+        """
+        Add a rule for one "EXCHANGE:TRADINGSYMBOL" (or PORTFOLIO for
+        portfolio_pnl). Returns its rule id.
+        """
+
+        with self.lock:
+
+            rule = AlertRule(next(self.ids), symbol, kind, value, **options)
+
+            self.rules[rule.rule_id] = rule
+
+            self._index(rule)
+
+            return rule.rule_id
+
+    # ---------------------------------------------------
+
+    def add_portfolio_rule(self, kind, value, **options):
+        """
+        Add a rule for every position, present and future, e.g.
+        add_portfolio_rule("pct_from_average", -10). Returns the
+        template id.
+        """
+
+        if kind == "portfolio_pnl":
+            return self.add_rule(PORTFOLIO, kind, value, **options)
+
+        with self.lock:
+
+            template_id = next(self.ids)
+
+            self.templates[template_id] = (kind, value, options)
+
+            for symbol in self.positions:
+                self._expand(template_id, symbol)
+
+            return template_id
+
+    # ---------------------------------------------------
+
+    def add_rules(self, rules):
+        """
+        Add rules from plain dicts: {"symbol", "kind", "value", ...};
+        entries without a symbol apply to the whole portfolio.
+        """
+
+        ids = []
+
+        for rule in rules:
+
+            rule = dict(rule)
+
+            symbol = rule.pop("symbol", None)
+
+            kind = rule.pop("kind")
+
+            value = rule.pop("value")
+
+            if symbol:
+                ids.append(self.add_rule(symbol, kind, value, **rule))
+            else:
+                ids.append(self.add_portfolio_rule(kind, value, **rule))
+
+        return ids
+
+    # ---------------------------------------------------
+
+    def remove_rule(self, rule_id):
+
+        with self.lock:
+
+            if rule_id in self.templates:
+
+                del self.templates[rule_id]
+
+                for rule in [rule for rule in self.rules.values() if rule.template == rule_id]:
+                    self.remove_rule(rule.rule_id)
+
+                return
+
+            rule = self.rules.pop(rule_id, None)
+
+            if rule is not None:
+                self._unindex(rule)
+
+    # ---------------------------------------------------
+
+    def set_positions(self, records):
+        """
+        Register holdings/positions records (tradingsymbol, exchange,
+        quantity, average_price, close_price, last_price). Levels of
+        rules that depend on them are recomputed.
+        """
+
+        with self.lock:
+
+            for item in records:
+
+                symbol = f"{item.get('exchange') or 'NSE'}:{item['tradingsymbol']}"
+
+                previous = self.positions.get(symbol)
+
+                quantity = float(item.get("quantity") or 0)
+
+                average_price = float(item.get("average_price") or 0)
+
+                last_price = float(item.get("last_price") or 0)
+
+                if previous is not None:
+                    self.invested_value -= previous["quantity"] * previous["average_price"]
+                    self.current_value -= previous["quantity"] * previous["last_price"]
+
+                self.invested_value += quantity * average_price
+
+                self.current_value += quantity * last_price
+
+                self.positions[symbol] = {
+                    "quantity": quantity,
+                    "average_price": average_price,
+                    "close_price": float(item.get("close_price") or 0),
+                    "last_price": last_price,
+                }
+
+                if previous is None:
+                    for template_id in self.templates:
+                        self._expand(template_id, symbol)
+
+                for rule in list(self.rules.values()):
+                    if rule.symbol == symbol and rule.kind in ("pct_from_average", "day_change"):
+                        self._unindex(rule)
+                        self._index(rule)
+
+    # ---------------------------------------------------
+
+    def _expand(self, template_id, symbol):
+
+        kind, value, options = self.templates[template_id]
+
+        rule = AlertRule(next(self.ids), symbol, kind, value, template=template_id, **options)
+
+        self.rules[rule.rule_id] = rule
+
+        self._index(rule)
+
+    # ---------------------------------------------------
+
+    def _level(self, rule):
+
+        if rule.kind in ("pct_from_average", "day_change"):
+
+            position = self.positions.get(rule.symbol)
+
+            base = None
+
+            if position is not None:
+                base = position["average_price"] if rule.kind == "pct_from_average" else position["close_price"]
+
+            if not base:
+                return None
+
+            return base * (1 + rule.value / 100.0)
+
+        return float(rule.value)
+
+    # ---------------------------------------------------
+
+    def _index(self, rule):
+
+        rule.level = self._level(rule)
+
+        if rule.level is None:
+            # Waits for the position it depends on.
+            return
+
+        index = self.indexes.setdefault(rule.symbol, _SymbolIndex())
+
+        if rule.armed:
+            key = rule.level
+            side = index.up if rule.direction == ABOVE else index.down
+        else:
+            # Fired: re-arms once the price is back past the band.
+            band = rule.band()
+            key = rule.level - band if rule.direction == ABOVE else rule.level + band
+            side = index.down if rule.direction == ABOVE else index.up
+
+        entry = (key, next(self.sequence), rule.rule_id)
+
+        side.add(entry)
+
+        index.entries[rule.rule_id] = (side, entry)
+
+    # ---------------------------------------------------
+
+    def _unindex(self, rule):
+
+        index = self.indexes.get(rule.symbol)
+
+        if index is None:
+            return
+
+        located = index.entries.pop(rule.rule_id, None)
+
+        if located is not None:
+            side, entry = located
+            side.discard(entry)
+
+    # ---------------------------------------------------
+
+    def on_price(self, symbol, price, timestamp=None):
+        """
+        Feed a new price. Returns the alerts it raised (and passes
+        each one to `on_alert`).
+        """
+
+        timestamp = timestamp or time.time()
+
+        with self.lock:
+
+            alerts = self._update(symbol, price, timestamp)
+
+            position = self.positions.get(symbol)
+
+            if position is not None and symbol != PORTFOLIO:
+
+                self.current_value += position["quantity"] * (price - position["last_price"])
+
+                position["last_price"] = price
+
+                if self.invested_value and PORTFOLIO in self.indexes:
+                    pnl_percentage = (self.current_value - self.invested_value) / self.invested_value * 100.0
+                    alerts += self._update(PORTFOLIO, pnl_percentage, timestamp)
+
+        if self.on_alert is not None:
+            for alert in alerts:
+                try:
+                    self.on_alert(alert)
+                except Exception as error:
+                    # Runs on the tick thread: report and carry on.
+                    print(f"Alert notification failed: {error!r}")
+
+        return alerts
+
+    # ---------------------------------------------------
+
+    def on_prices(self, prices, timestamp=None):
+
+        alerts = []
+
+        for symbol, price in prices.items():
+            alerts += self.on_price(symbol, price, timestamp)
+
+        return alerts
+
+    # ---------------------------------------------------
+
+    def _update(self, symbol, price, timestamp):
+
+        index = self.indexes.get(symbol)
+
+        if index is None:
+            return []
+
+        previous = index.price
+
+        index.price = price
+
+        # Entries are (level, sequence, rule_id); the infinite sequence
+        # numbers make a bound sort before or after every entry at a level.
+        if previous is None:
+            # First price: everything already past its level acts now.
+            crossed_up = list(index.up.irange(maximum=(price, INF)))
+            crossed_down = list(index.down.irange(minimum=(price, -INF)))
+
+        elif price > previous:
+            crossed_up = list(index.up.irange((previous, INF), (price, INF)))
+            crossed_down = []
+
+        elif price < previous:
+            crossed_up = []
+            crossed_down = list(index.down.irange((price, -INF), (previous, -INF)))
+
+        else:
+            return []
+
+        alerts = []
+
+        for side, crossed in ((index.up, crossed_up), (index.down, crossed_down)):
+
+            for entry in crossed:
+
+                side.remove(entry)
+
+                rule = self.rules[entry[2]]
+
+                del index.entries[rule.rule_id]
+
+                if rule.armed:
+
+                    rule.armed = False
+
+                    if rule.last_fired is not None and timestamp - rule.last_fired < rule.cooldown:
+                        rule.suppressed += 1
+                    else:
+                        rule.last_fired = timestamp
+                        alerts.append(self._alert(rule, price, timestamp))
+
+                else:
+                    rule.armed = True
+
+                self._index(rule)
+
+        return alerts
+
+    # ---------------------------------------------------
+
+    def _alert(self, rule, price, timestamp):
+
+        message = rule.message or (
+            f"{rule.symbol} {rule.kind.replace('_', ' ')} {rule.value}: "
+            f"{price:,.2f} is {rule.direction} {rule.level:,.2f}"
+        )
+
+        return {
+            "rule_id": rule.rule_id,
+            "symbol": rule.symbol,
+            "kind": rule.kind,
+            "direction": rule.direction,
+            "level": rule.level,
+            "price": price,
+            "timestamp": timestamp,
+            "message": message,
+        }
+
+    # ---------------------------------------------------
+
+    def attach(self, tick_stream):
+        """
+        Evaluate rules on every tick of a TickStream.
+        """
+
+        def listener(token, price, timestamp):
+
+            symbol = tick_stream.token_symbols.get(token)
+
+            if symbol is not None:
+                self.on_price(symbol, price, timestamp)
+
+        tick_stream.add_listener(listener)
+
+    # ---------------------------------------------------
+
+    def stats(self):
+
+        with self.lock:
+
+            return {
+                "rules": len(self.rules),
+                "templates": len(self.templates),
+                "symbols": len(self.indexes),
+                "armed": sum(1 for rule in self.rules.values() if rule.armed),
+                "suppressed": sum(rule.suppressed for rule in self.rules.values()),
+            }
+
+
+def mail_alerts(dispatcher, to):
+    """
+    on_alert callback that mails each alert through a MailDispatcher;
+    alerts within its digest window arrive as one e-mail.
+    """
+
+    def on_alert(alert):
+        dispatcher.send(f"[SP] Alert - {alert['symbol']}", plain_body=alert["message"], to=to)
+
+    return on_alert
@@ -0,0 +1,322 @@
+"""
+async_zerodha_client.py
+
+asyncio-native Zerodha client.
+
+Mirrors the ZerodhaClient surface, but every call is a coroutine that
+goes through one pooled aiohttp session, so many requests can be in
+flight from a single event loop. Login reuses the ZerodhaClient
+TokenManager/Config flow.
+"""
+
+import asyncio
+import json
+import time
+
+import aiohttp
+from kiteconnect import KiteConnect
+from kiteconnect import exceptions as kite_exceptions
+
+from metrics import get_metrics
+from rate_limiter import PRIORITY_INTERACTIVE, get_scheduler
+from zerodha_client import PORTFOLIO_SECTIONS, ZerodhaClient
+
+
+class AsyncZerodhaClient:
+
+    def __init__(self, max_connections=20, timeout=7, priority=PRIORITY_INTERACTIVE):
+
+        # The blocking client owns the login flow and the token storage.
+        self.sync_client = ZerodhaClient()
+
+        self.config = self.sync_client.config
+
+        self.token_manager = self.sync_client.token_manager
+
+        self.root = self.sync_client.kite.root
+
+        self.max_connections = max_connections
+
+        self.timeout = timeout
+
+        self.session = None
+
+        # Shares the process-wide rate limits with ZerodhaClient.
+        self.scheduler = get_scheduler()
+
+        self.priority = priority
+
+        self.metrics = get_metrics()
+
+        # Seconds spent per endpoint in the last get_personal_portfolio call.
+        self.portfolio_timings = {}
+
+    # -----------------------------------------------------
+
+    async def __aenter__(self):
+
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+
+        await self.close()
+
+    # -----------------------------------------------------
+
+    async def login(self):
+        """
+        Authenticate using the shared ZerodhaClient login flow.
+        """
+
+        await asyncio.to_thread(self.sync_client.login)
+
+    # -----------------------------------------------------
+
+    async def close(self):
+
+        if self.session is not None:
+
+            await self.session.close()
+
+            self.session = None
+
+    # -----------------------------------------------------
+
+    def _get_session(self):
+
+        if self.session is None or self.session.closed:
+
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=60
+            )
+
+            self.session = aiohttp.ClientSession(
+                base_url=self.root,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+        return self.session
+
+    # -----------------------------------------------------
+
+    def _headers(self):
+
+        headers = {
+            "X-Kite-Version": KiteConnect.kite_header_version
+        }
+
+        access_token = self.sync_client.kite.access_token
+
+        if access_token:
+            headers["Authorization"] = f"token {self.config.API_KEY}:{access_token}"
+
+        return headers
+
+    # -----------------------------------------------------
+
+    async def _get(self, path, params=None, endpoint_class="default"):
+        """
+        GET a Kite endpoint and unwrap the `data` field,
+        raising the same exceptions KiteConnect does.
+        """
+
+        # Recorded under the KiteConnect method names, e.g. /quote/ltp -> ltp.
+        endpoint = path.rstrip("/").rsplit("/", 1)[-1]
+
+        call = {"waited": 0.0, "response_bytes": 0}
+
+        error = None
+
+        started = time.perf_counter()
+
+        try:
+            return await self._authenticated_send(path, params, endpoint_class, call)
+
+        except Exception as exc:
+            error = type(exc).__name__
+            raise
+
+        finally:
+            self.metrics.observe(
+                endpoint,
+                endpoint_class,
+                time.perf_counter() - started,
+                error=error,
+                response_bytes=call["response_bytes"],
+                waited=call["waited"]
+            )
+
+    # -----------------------------------------------------
+
+    async def _authenticated_send(self, path, params, endpoint_class, call):
+        """
+        _send, logging in again and retrying once when Kite rejects
+        a token that login() trusted without checking.
+        """
+
+        client = self.sync_client
+
+        token = client.kite.access_token
+
+        try:
+            result = await self._send(path, params, endpoint_class, call)
+
+        except kite_exceptions.TokenException:
+
+            if not client.token_unverified and client.kite.access_token == token:
+                raise
+
+            # The headers are rebuilt from the new token by _send.
+            await asyncio.to_thread(client._reauthenticate, token)
+
+            result = await self._send(path, params, endpoint_class, call)
+
+        client.token_unverified = False
+
+        return result
+
+    # -----------------------------------------------------
+
+    async def _send(self, path, params, endpoint_class, call):
+
+        call["waited"] += await self.scheduler.acquire_async(endpoint_class, self.priority)
+
+        session = self._get_session()
+
+        async with session.get(path, params=params, headers=self._headers()) as response:
+
+            body = await response.read()
+
+            call["response_bytes"] = len(body)
+
+            if "json" not in response.headers.get("Content-Type", ""):
+                body = body.decode("utf-8", "replace")
+                raise kite_exceptions.DataException(
+                    f"Unknown Content-Type ({response.content_type}) with response: ({body})",
+                    code=response.status
+                )
+
+            payload = json.loads(body)
+
+        if payload.get("status") == "error" or payload.get("error_type"):
+            exception = getattr(
+                kite_exceptions,
+                payload.get("error_type") or "",
+                kite_exceptions.GeneralException
+            )
+            raise exception(payload.get("message"), code=response.status)
+
+        return payload["data"]
+
+    # -----------------------------------------------------
+
+    @staticmethod
+    def _instrument_params(symbols):
+
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        return [("i", symbol) for symbol in symbols]
+
+    # -----------------------------------------------------
+
+    async def get_profile(self):
+
+        return await self._get("/user/profile")
+
+    # -----------------------------------------------------
+
+    async def get_holdings(self):
+
+        return await self._get("/portfolio/holdings")
+
+    # -----------------------------------------------------
+
+    async def get_positions(self):
+
+        return await self._get("/portfolio/positions")
+
+    # -----------------------------------------------------
+
+    async def get_orders(self):
+
+        orders = await self._get("/orders", endpoint_class="order")
+
+        return self.sync_client.kite._format_response(orders)
+
+    # -----------------------------------------------------
+
+    async def get_trades(self):
+
+        trades = await self._get("/trades", endpoint_class="order")
+
+        return self.sync_client.kite._format_response(trades)
+
+    # -----------------------------------------------------
+
+    async def get_funds(self):
+
+        return await self._get("/user/margins")
+
+    # -----------------------------------------------------
+
+    async def get_ltp(self, symbol):
+
+        return await self._get("/quote/ltp", params=self._instrument_params(symbol), endpoint_class="quote")
+
+    # -----------------------------------------------------
+
+    async def get_quote(self, symbol):
+
+        return await self.get_quotes(symbol)
+
+    # -----------------------------------------------------
+
+    async def get_quotes(self, symbols):
+
+        data = await self._get("/quote", params=self._instrument_params(symbols), endpoint_class="quote")
+
+        return {
+            key: self.sync_client.kite._format_response(value)
+            for key, value in data.items()
+        }
+
+    # -----------------------------------------------------
+
+    def logout(self):
+
+        self.sync_client.logout()
+
+    # -----------------------------------------------------
+
+    async def get_personal_portfolio(self, sections=None):
+        """
+        Returns everything related to the account
+        in a single dictionary, fetching the sections concurrently.
+        Per-endpoint timings are kept in `self.portfolio_timings`.
+        """
+
+        if sections is None:
+            sections = list(PORTFOLIO_SECTIONS)
+
+        unknown = [name for name in sections if name not in PORTFOLIO_SECTIONS]
+
+        if unknown:
+            raise ValueError(f"Unknown portfolio sections: {', '.join(unknown)}")
+
+        timings = {}
+
+        async def fetch(name):
+            started = time.perf_counter()
+            try:
+                return await getattr(self, PORTFOLIO_SECTIONS[name])()
+            finally:
+                timings[name] = time.perf_counter() - started
+
+        results = await asyncio.gather(*(fetch(name) for name in sections))
+
+        self.portfolio_timings = timings
+
+        return dict(zip(sections, results))
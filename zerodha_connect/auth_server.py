@@ -9,15 +9,9 @@ from http.server import BaseHTTPRequestHandler, HTTPServer
 from urllib.parse import urlparse, parse_qs
 import threading
 
-from token_manager import TokenManager
-
 
 class ZerodhaCallbackHandler(BaseHTTPRequestHandler):
 
-    token_manager = TokenManager()
-
-    request_token = None
-
     def do_GET(self):
 
         parsed = urlparse(self.path)
@@ -28,10 +22,6 @@ class ZerodhaCallbackHandler(BaseHTTPRequestHandler):
 
             token = params["request_token"][0]
 
-            self.token_manager.save_request_token(token)
-
-            ZerodhaCallbackHandler.request_token = token
-
             self.send_response(200)
 
             self.send_header("Content-Type", "text/html")
@@ -50,6 +40,9 @@ class ZerodhaCallbackHandler(BaseHTTPRequestHandler):
             </html>
             """)
 
+            # Hand the token to the AuthServer that owns this socket.
+            self.server.auth_server.receive_request_token(token)
+
         else:
 
             self.send_response(400)
@@ -64,26 +57,48 @@ class ZerodhaCallbackHandler(BaseHTTPRequestHandler):
 
 
 class AuthServer:
+    """
+    Callback server for one login. The request token is stored on the
+    instance and signalled through an event, so several servers can run
+    side by side. Pass port=0 to bind an ephemeral port.
+    """
 
-    def __init__(self, host="127.0.0.1", port=8000):
+    def __init__(self, host="127.0.0.1", port=8000, token_manager=None):
 
         self.host = host
 
-        self.port = port
+        self.token_manager = token_manager
+
+        self.request_token = None
+
+        self.token_received = threading.Event()
 
         self.server = HTTPServer(
-            (self.host, self.port),
+            (host, port),
             ZerodhaCallbackHandler
         )
 
+        self.server.auth_server = self
+
+        # The actual port, useful when binding port 0.
+        self.port = self.server.server_address[1]
+
+        self.thread = None
+
+    @property
+    def redirect_url(self):
+
+        return f"http://{self.host}:{self.port}"
+
     def start(self):
 
-        thread = threading.Thread(
+        self.thread = threading.Thread(
             target=self.server.serve_forever,
+            kwargs={"poll_interval": 0.05},
             daemon=True
         )
 
-        thread.start()
+        self.thread.start()
 
     def stop(self):
 
@@ -91,6 +106,25 @@ class AuthServer:
 
         self.server.server_close()
 
+    def receive_request_token(self, token):
+
+        if self.token_manager is not None:
+            self.token_manager.save_request_token(token)
+
+        self.request_token = token
+
+        self.token_received.set()
+
+    def wait_for_request_token(self, timeout=None):
+        """
+        Block until the login redirect arrives or `timeout`
+        seconds pass. Returns the token, or None on timeout.
+        """
+
+        self.token_received.wait(timeout)
+
+        return self.request_token
+
     def get_request_token(self):
 
-        return ZerodhaCallbackHandler.request_token
\ No newline at end of file
+        return self.request_token
@@ -0,0 +1,326 @@
+"""
+benchmarks.py
+
+Offline latency benchmarks for zerodha_connect.
+
+Runs ZerodhaClient against the local Kite stand-in (kite_stub) and mail
+against the local SMTP stand-in (smtp_stub), so nothing needs a broker
+account or network access. Each scenario is timed over several
+iterations and reported as p50 / p95 / p99 milliseconds:
+
+    login           full browser login flow, driven headlessly
+    portfolio       get_personal_portfolio
+    quotes_10/100/1000
+                    get_quotes with a cold quote cache
+    save_notify     save_portfolio_json, holdings analytics, HTML
+                    report and mail delivery
+
+Results are compared with a stored baseline
+(data/benchmark_baseline.json, written with --update-baseline). The run
+exits with status 1 when a scenario's p50 or p95 is slower than the
+baseline by more than the tolerance.
+
+    python benchmarks.py --iterations 10 --latency 0.02
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from file_utils import atomic_write_text
+from holdings_analytics import holdings_analytics
+from kite_stub import KiteStubServer, run_headless_login
+from mail_dispatcher import MailDispatcher
+from report_renderer import render_table
+from smtp_stub import SmtpStubServer
+
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "data" / "benchmark_baseline.json"
+
+SCENARIOS = ("login", "portfolio", "quotes_10", "quotes_100", "quotes_1000", "save_notify")
+
+# A scenario regresses when it is this much slower than the baseline...
+DEFAULT_TOLERANCE = 0.25
+
+# ...and by at least this many milliseconds, so noise on very fast
+# scenarios does not fail the run.
+MIN_REGRESSION_MS = 5.0
+
+
+def percentile(values, fraction):
+    """
+    Linear-interpolated percentile of a non-empty list.
+    """
+
+    ordered = sorted(values)
+
+    position = (len(ordered) - 1) * fraction
+
+    lower = int(position)
+
+    upper = min(lower + 1, len(ordered) - 1)
+
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples):
+    """
+    {p50, p95, p99, mean, runs} in milliseconds.
+    """
+
+    milliseconds = [sample * 1000.0 for sample in samples]
+
+    return {
+        "p50": round(percentile(milliseconds, 0.50), 3),
+        "p95": round(percentile(milliseconds, 0.95), 3),
+        "p99": round(percentile(milliseconds, 0.99), 3),
+        "mean": round(sum(milliseconds) / len(milliseconds), 3),
+        "runs": len(milliseconds),
+    }
+
+
+class BenchmarkSuite:
+
+    def __init__(self, iterations=5, latency=0.02, jitter=0.0, rate_limits=True):
+
+        self.iterations = iterations
+
+        self.latency = latency
+
+        self.jitter = jitter
+
+        self.rate_limits = rate_limits
+
+        self.work_dir = None
+
+        self.kite = None
+
+        self.smtp = None
+
+        self.client = None
+
+        self.dispatcher = None
+
+    # ---------------------------------------------------
+
+    def __enter__(self):
+
+        self.work_dir = tempfile.TemporaryDirectory(prefix="zerodha-bench-")
+
+        stub_options = {} if self.rate_limits else {"rate_limits": None}
+
+        self.kite = KiteStubServer(latency=self.latency, jitter=self.jitter, **stub_options).start()
+
+        self.smtp = SmtpStubServer().start()
+
+        self.dispatcher = MailDispatcher(self.smtp.host, self.smtp.port, sender="bench@localhost", use_tls=False)
+
+        # Every later scenario runs on a session from a real login.
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.client = self._login()[0]
+
+        return self
+
+    # ---------------------------------------------------
+
+    def __exit__(self, *exc_info):
+
+        self.dispatcher.close()
+
+        self.smtp.stop()
+
+        self.kite.stop()
+
+        self.work_dir.cleanup()
+
+    # ---------------------------------------------------
+
+    def _login(self):
+
+        env_file = Path(self.work_dir.name) / f"login-{time.perf_counter_ns()}.env"
+
+        env_file.touch()
+
+        return run_headless_login(env_file, stub=self.kite)
+
+    # ---------------------------------------------------
+
+    def bench_login(self):
+
+        return self._login()[1]
+
+    # ---------------------------------------------------
+
+    def bench_portfolio(self):
+
+        started = time.perf_counter()
+
+        self.client.get_personal_portfolio()
+
+        return time.perf_counter() - started
+
+    # ---------------------------------------------------
+
+    def bench_quotes(self, count):
+
+        symbols = [f"NSE:BENCH{index}" for index in range(count)]
+
+        # Measure the API path, not the cache.
+        self.client.quote_cache.invalidate()
+
+        started = time.perf_counter()
+
+        quotes = self.client.get_quotes(symbols)
+
+        elapsed = time.perf_counter() - started
+
+        if len(quotes) != count:
+            raise RuntimeError(f"get_quotes returned {len(quotes)} of {count} quotes.")
+
+        return elapsed
+
+    # ---------------------------------------------------
+
+    def bench_save_notify(self):
+
+        output_path = Path(self.work_dir.name) / "portfolio.json"
+
+        started = time.perf_counter()
+
+        portfolio = self.client.get_personal_portfolio()
+
+        self.client.save_portfolio_json(portfolio, output_path=output_path)
+
+        analytics = holdings_analytics(output_path)
+
+        table_html = render_table(analytics.records(), sort_by="pnl_percentage")
+
+        self.dispatcher.send("[SP] Benchmark", table_html, to="bench@localhost").result(timeout=30)
+
+        return time.perf_counter() - started
+
+    # ---------------------------------------------------
+
+    def scenario(self, name):
+
+        if name.startswith("quotes_"):
+            count = int(name.split("_", 1)[1])
+            return lambda: self.bench_quotes(count)
+
+        return getattr(self, f"bench_{name}")
+
+    # ---------------------------------------------------
+
+    def run(self, names=None):
+        """
+        {scenario: summary} for the given scenarios (default: all).
+        """
+
+        results = {}
+
+        for name in names or SCENARIOS:
+
+            bench = self.scenario(name)
+
+            samples = []
+
+            for _ in range(self.iterations):
+
+                # The client logs progress; keep the report readable.
+                with contextlib.redirect_stdout(io.StringIO()):
+                    samples.append(bench())
+
+            results[name] = summarize(samples)
+
+        return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Regressions as [(scenario, metric, baseline ms, current ms)].
+    """
+
+    regressions = []
+
+    for name, summary in results.items():
+
+        reference = baseline.get(name)
+
+        if not reference:
+            continue
+
+        for metric in ("p50", "p95"):
+
+            current, expected = summary[metric], reference[metric]
+
+            if current > expected * (1 + tolerance) and current - expected > MIN_REGRESSION_MS:
+                regressions.append((name, metric, expected, current))
+
+    return regressions
+
+
+def format_report(results, baseline=None):
+
+    baseline = baseline or {}
+
+    lines = [f"{'scenario':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'base p95':>10}"]
+
+    for name, summary in results.items():
+
+        reference = (baseline.get(name) or {}).get("p95")
+
+        lines.append(
+            f"{name:<14}{summary['p50']:>10.1f}{summary['p95']:>10.1f}{summary['p99']:>10.1f}"
+            f"{'' if reference is None else format(reference, '.1f'):>10}"
+        )
+
+    return "\n".join(lines)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Offline zerodha_connect latency benchmarks")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub API latency per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random stub latency (seconds)")
+    parser.add_argument("--no-rate-limits", action="store_true", help="Disable the stub's Kite rate limits")
+    parser.add_argument("--only", nargs="+", choices=SCENARIOS, help="Scenarios to run")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    args = parser.parse_args()
+
+    baseline_path = Path(args.baseline)
+
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+
+    with BenchmarkSuite(args.iterations, args.latency, args.jitter, not args.no_rate_limits) as suite:
+        results = suite.run(args.only)
+
+    print(format_report(results, baseline))
+
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(baseline_path, json.dumps({**baseline, **results}, indent=2))
+        print(f"Baseline saved to: {baseline_path}")
+        return 0
+
+    if not baseline:
+        print("No baseline stored yet; run with --update-baseline to create one.")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+
+    for name, metric, expected, current in regressions:
+        print(f"REGRESSION {name} {metric}: {current:.1f} ms (baseline {expected:.1f} ms)")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,4 +23,33 @@ class Config:
     REDIRECT_URL = os.getenv(
         "REDIRECT_URL",
         "http://127.0.0.1:8000"
-    )
\ No newline at end of file
+    )
+
+    # Quote cache (seconds / entries)
+    LTP_CACHE_TTL = float(os.getenv("LTP_CACHE_TTL", "1"))
+
+    QUOTE_CACHE_TTL = float(os.getenv("QUOTE_CACHE_TTL", "2"))
+
+    QUOTE_CACHE_STALE_TTL = float(os.getenv("QUOTE_CACHE_STALE_TTL", "30"))
+
+    QUOTE_CACHE_SIZE = int(os.getenv("QUOTE_CACHE_SIZE", "5000"))
+
+    # Kite calls: overall deadline and retries (seconds / count)
+    CALL_DEADLINE = float(os.getenv("CALL_DEADLINE", "10"))
+
+    CALL_RETRIES = int(os.getenv("CALL_RETRIES", "2"))
+
+    RETRY_BACKOFF = float(os.getenv("RETRY_BACKOFF", "0.2"))
+
+    RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "2"))
+
+    # Hedged reads: duplicate request after this latency quantile,
+    # or after HEDGE_DELAY seconds while there are too few samples
+    HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+
+    HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "0.5"))
+
+    # Circuit breaker: consecutive failures to open, seconds until a trial call
+    BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+
+    BREAKER_RESET = float(os.getenv("BREAKER_RESET", "10"))
@@ -0,0 +1,75 @@
+"""
+file_utils.py
+
+Small helpers for safe file writes shared by the zerodha_connect tools.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Exclusive inter-process lock held on `path` (a sidecar lock file).
+    """
+
+    with open(path, "a+") as lock_file:
+
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+
+        try:
+            yield
+
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def atomic_open(path, mode="wb", encoding=None):
+    """
+    Open a temp file next to `path` for writing and rename it into
+    place when the block exits cleanly, so readers never see a
+    half-written file. On error the temp file is removed.
+    """
+
+    directory = os.path.dirname(os.path.abspath(path))
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_path, path)
+
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def atomic_write_text(path, text, encoding="utf-8"):
+    """
+    Atomically replace `path` with `text`.
+    """
+
+    with atomic_open(path, "w", encoding=encoding) as file:
+        file.write(text)
@@ -0,0 +1,415 @@
+"""
+history_store.py
+
+Local OHLCV history per symbol and interval.
+
+Candles are kept in one compact binary file per (source, interval,
+symbol): a small header with the covered time range followed by
+fixed-size records sorted by time. Reads memory-map the file and slice
+it with a binary search, so they need no network and no parsing.
+
+refresh() only downloads the part of the requested range that is not
+covered yet. Long ranges are split into chunks that respect the
+source's per-request candle limit, and the chunks are fetched in
+parallel (broker calls still queue on the "historical" rate limit).
+"""
+
+import re
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+from file_utils import atomic_open, file_lock
+from public_market_data import get_history
+
+
+MAGIC = b"ZOHL"
+
+VERSION = 1
+
+# magic, version, covered from, covered to (epoch seconds)
+HEADER = struct.Struct("<4sHqq")
+
+CANDLE = np.dtype([
+    ("timestamp", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<i8"),
+])
+
+INTERVALS = ("minute", "5minute", "15minute", "30minute", "60minute", "day")
+
+DEFAULT_DIR = Path(__file__).resolve().parent / "data" / "history"
+
+
+def _epoch(value, tz=timezone.utc, end=False):
+    """
+    Epoch seconds of a datetime, epoch number or date. A date is
+    read in `tz` (the zone the source stamps its candles in) and
+    means the start of that day, or its last second when `end`.
+    """
+
+    if value is None:
+        return int(time.time())
+
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.astimezone()
+        return int(value.timestamp())
+
+    if isinstance(value, date):
+        midnight = int(datetime(value.year, value.month, value.day, tzinfo=tz).timestamp())
+        return midnight + 86399 if end else midnight
+
+    return int(value)
+
+
+class YahooSource:
+    """
+    Public Yahoo Finance chart data; symbols are Yahoo tickers
+    such as "INFY.NS".
+    """
+
+    name = "yahoo"
+
+    # Zone that dates passed to the store are read in.
+    TIMEZONE = timezone.utc
+
+    INTERVALS = {
+        "minute": "1m",
+        "5minute": "5m",
+        "15minute": "15m",
+        "30minute": "30m",
+        "60minute": "60m",
+        "day": "1d",
+    }
+
+    # Days of data Yahoo returns per request.
+    CHUNK_DAYS = {
+        "minute": 7,
+        "5minute": 60,
+        "15minute": 60,
+        "30minute": 60,
+        "60minute": 700,
+        "day": 3650,
+    }
+
+    def chunk_days(self, interval):
+
+        return self.CHUNK_DAYS[interval]
+
+    def fetch(self, symbol, start, end, interval):
+
+        return get_history(symbol, start, end, interval=self.INTERVALS[interval])
+
+
+class KiteSource:
+    """
+    Broker candles through ZerodhaClient.get_historical_data.
+    Symbols are "EXCHANGE:TRADINGSYMBOL" (resolved through an
+    InstrumentStore when one is given, else through get_ltp) or
+    instrument tokens.
+    """
+
+    name = "kite"
+
+    # Days Kite allows per historical_data request.
+    CHUNK_DAYS = {
+        "minute": 60,
+        "5minute": 100,
+        "15minute": 200,
+        "30minute": 200,
+        "60minute": 400,
+        "day": 2000,
+    }
+
+    # Kite reads the from/to dates as Indian time and stamps daily
+    # candles at 00:00 IST.
+    TIMEZONE = timezone(timedelta(hours=5, minutes=30))
+
+    def __init__(self, client, instruments=None):
+
+        self.client = client
+
+        self.instruments = instruments
+
+        self.tokens = {}
+
+    def chunk_days(self, interval):
+
+        return self.CHUNK_DAYS[interval]
+
+    def _token(self, symbol):
+
+        if isinstance(symbol, int) or str(symbol).isdigit():
+            return int(symbol)
+
+        if symbol not in self.tokens:
+
+            token = self.instruments.token(symbol) if self.instruments is not None else None
+
+            if token is None:
+                token = self.client.get_ltp(symbol)[symbol]["instrument_token"]
+
+            self.tokens[symbol] = token
+
+        return self.tokens[symbol]
+
+    def fetch(self, symbol, start, end, interval):
+
+        candles = self.client.get_historical_data(
+            self._token(symbol),
+            datetime.fromtimestamp(start, self.TIMEZONE).replace(tzinfo=None),
+            datetime.fromtimestamp(end, self.TIMEZONE).replace(tzinfo=None),
+            interval
+        )
+
+        return [
+            (
+                _epoch(candle["date"]),
+                candle["open"],
+                candle["high"],
+                candle["low"],
+                candle["close"],
+                int(candle.get("volume") or 0),
+            )
+            for candle in candles
+        ]
+
+
+class HistoryStore:
+
+    def __init__(self, source, data_dir=None, max_workers=4):
+
+        self.source = source
+
+        self.data_dir = Path(data_dir) if data_dir else DEFAULT_DIR / source.name
+
+        self.max_workers = max_workers
+
+    # ---------------------------------------------------
+
+    def _bounds(self, start, end):
+        """
+        Epoch seconds of a [start, end] range, dates taken as whole
+        days in the source's time zone.
+        """
+
+        tz = getattr(self.source, "TIMEZONE", timezone.utc)
+
+        # Nothing is covered past now, even when today was asked for.
+        return _epoch(start, tz), min(_epoch(end, tz, end=True), int(time.time()))
+
+    # ---------------------------------------------------
+
+    def path(self, symbol, interval):
+
+        if interval not in INTERVALS:
+            raise ValueError(f"Unknown candle interval: {interval}")
+
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", str(symbol))
+
+        return self.data_dir / interval / f"{name}.bin"
+
+    # ---------------------------------------------------
+
+    def _read(self, path):
+        """
+        (covered_from, covered_to, candles) of a store file; candles
+        is a read-only memory map (or an empty array).
+        """
+
+        if not path.exists() or path.stat().st_size < HEADER.size:
+            return None, None, np.empty(0, dtype=CANDLE)
+
+        with path.open("rb") as file:
+            magic, version, covered_from, covered_to = HEADER.unpack(file.read(HEADER.size))
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a history store file: {path}")
+
+        if path.stat().st_size == HEADER.size:
+            return covered_from, covered_to, np.empty(0, dtype=CANDLE)
+
+        candles = np.memmap(path, dtype=CANDLE, mode="r", offset=HEADER.size)
+
+        return covered_from, covered_to, candles
+
+    # ---------------------------------------------------
+
+    def coverage(self, symbol, interval="day"):
+        """
+        (from, to) epoch seconds covered on disk, or None.
+        """
+
+        covered_from, covered_to, _ = self._read(self.path(symbol, interval))
+
+        return None if covered_from is None else (covered_from, covered_to)
+
+    # ---------------------------------------------------
+
+    def read(self, symbol, start=None, end=None, interval="day"):
+        """
+        Candles in [start, end] from disk as a structured NumPy array
+        (fields timestamp, open, high, low, close, volume). No network.
+        Date bounds include the whole day.
+        """
+
+        _, _, candles = self._read(self.path(symbol, interval))
+
+        timestamps = candles["timestamp"]
+
+        start_at, end_at = self._bounds(start, end)
+
+        lower = 0 if start is None else np.searchsorted(timestamps, start_at, side="left")
+
+        upper = len(candles) if end is None else np.searchsorted(timestamps, end_at, side="right")
+
+        return np.array(candles[lower:upper])
+
+    # ---------------------------------------------------
+
+    def missing_ranges(self, symbol, start, end=None, interval="day"):
+        """
+        [(from, to)] epoch ranges of [start, end] not on disk yet.
+        """
+
+        start, end = self._bounds(start, end)
+
+        covered_from, covered_to, candles = self._read(self.path(symbol, interval))
+
+        if covered_from is None:
+            return [(start, end)] if start < end else []
+
+        ranges = []
+
+        if start < covered_from:
+            ranges.append((start, covered_from))
+
+        if end > covered_to:
+            # Refetch from the last stored candle, which may have been
+            # incomplete (e.g. today's bar) when it was saved.
+            last = int(candles["timestamp"][-1]) if len(candles) else covered_to
+            ranges.append((min(covered_to, last), end))
+
+        return ranges
+
+    # ---------------------------------------------------
+
+    def _chunks(self, ranges, interval):
+
+        step = self.source.chunk_days(interval) * 86400
+
+        chunks = []
+
+        for range_start, range_end in ranges:
+
+            chunk_start = range_start
+
+            while chunk_start < range_end:
+                chunk_end = min(chunk_start + step, range_end)
+                chunks.append((chunk_start, chunk_end))
+                chunk_start = chunk_end
+
+        return chunks
+
+    # ---------------------------------------------------
+
+    def refresh(self, symbol, start, end=None, interval="day"):
+        """
+        Download whatever part of [start, end] (default: now) is
+        missing and merge it into the store. Returns the number of
+        candles fetched.
+        """
+
+        start, end = self._bounds(start, end)
+
+        path = self.path(symbol, interval)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with file_lock(path.with_name(path.name + ".lock")):
+
+            ranges = self.missing_ranges(symbol, start, end, interval)
+
+            if not ranges:
+                return 0
+
+            chunks = self._chunks(ranges, interval)
+
+            workers = max(1, min(self.max_workers, len(chunks)))
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    lambda chunk: self.source.fetch(symbol, chunk[0], chunk[1], interval),
+                    chunks
+                ))
+
+            fetched = np.array(
+                [tuple(candle) for result in results for candle in result],
+                dtype=CANDLE
+            )
+
+            covered_from, covered_to, existing = self._read(path)
+
+            # Copy out of the memory map so the file can be replaced.
+            existing = np.array(existing)
+
+            merged = np.concatenate([existing, fetched])
+
+            # Sort by time; where a candle was refetched keep the new one.
+            order = np.argsort(merged["timestamp"], kind="stable")
+
+            merged = merged[order]
+
+            keep = np.ones(len(merged), dtype=bool)
+
+            keep[:-1] = merged["timestamp"][1:] != merged["timestamp"][:-1]
+
+            merged = merged[keep]
+
+            covered_from = start if covered_from is None else min(covered_from, start)
+
+            covered_to = end if covered_to is None else max(covered_to, end)
+
+            with atomic_open(path, "wb") as file:
+                file.write(HEADER.pack(MAGIC, VERSION, covered_from, covered_to))
+                file.write(merged.tobytes())
+
+        return len(fetched)
+
+    # ---------------------------------------------------
+
+    def get(self, symbol, start, end=None, interval="day"):
+        """
+        refresh() then read(): candles for [start, end], fetching only
+        what is not stored yet.
+        """
+
+        self.refresh(symbol, start, end, interval)
+
+        return self.read(symbol, start, end, interval)
+
+    # ---------------------------------------------------
+
+    def refresh_many(self, symbols, start, end=None, interval="day"):
+        """
+        refresh() several symbols; returns {symbol: candles fetched or
+        the exception raised}.
+        """
+
+        results = {}
+
+        for symbol in symbols:
+            try:
+                results[symbol] = self.refresh(symbol, start, end, interval)
+            except Exception as error:
+                results[symbol] = error
+
+        return results
@@ -0,0 +1,311 @@
+"""
+holdings_analytics.py
+
+Vectorized analytics over portfolio holdings.
+
+Holdings are loaded once into NumPy arrays and every metric (P&L %,
+weights, day change, invested vs current value, exchange / sector
+aggregates) is computed in one vectorized pass. Parsed snapshots are
+cached on the file's mtime, so repeated calls do not re-read the file,
+and only the sections that are needed are parsed.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from portfolio_io import load_portfolio, load_sections
+
+
+DEFAULT_PATH = Path(__file__).resolve().parent / "data" / "portfolio.json"
+
+_cache = {}
+
+_cache_lock = threading.Lock()
+
+
+def _file_stamp(path):
+
+    stat = os.stat(path)
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_portfolio_cached(path=None, sections=None):
+    """
+    load_portfolio, re-reading the file only when it changed. With
+    `sections`, only those top-level sections are parsed; sections
+    already parsed from the same file are reused, whichever call
+    asked for them.
+    """
+
+    path = str(path or DEFAULT_PATH)
+
+    key = ("portfolio", path)
+
+    stamp = _file_stamp(path)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+
+    if cached is None or cached[0] != stamp:
+        cached = None
+
+    elif cached[2] is None or (sections and cached[2].issuperset(sections)):
+        return cached[1]
+
+    if not sections:
+        data, parsed = load_portfolio(path), None
+
+    else:
+        missing = [name for name in sections if cached is None or name not in cached[2]]
+
+        data = load_sections(path, missing)
+
+        if cached is not None:
+            data = {**cached[1], **data}
+
+        parsed = frozenset(missing).union(cached[2] if cached is not None else ())
+
+    with _cache_lock:
+        _cache[key] = (stamp, data, parsed)
+
+    return data
+
+
+def record_symbol(item):
+    """
+    Trading symbol of a holding/position record, or None when the
+    record has no symbol or no numeric prices.
+    """
+
+    if not isinstance(item, dict):
+        return None
+
+    symbol = item.get("tradingsymbol") or item.get("trading_symbol")
+
+    last_price = item.get("last_price")
+
+    average_price = item.get("average_price")
+
+    if not isinstance(symbol, str):
+        return None
+
+    if not isinstance(last_price, (int, float)) or not isinstance(average_price, (int, float)):
+        return None
+
+    return symbol
+
+
+class HoldingsAnalytics:
+    """
+    Column arrays and derived metrics for a list of holding
+    (or position) records. Records without a tradingsymbol or
+    numeric prices are skipped.
+    """
+
+    def __init__(self, records, sectors=None):
+
+        rows = []
+
+        for item in records or []:
+
+            symbol = record_symbol(item)
+
+            if symbol is not None:
+                rows.append((symbol, item))
+
+        self.symbols = np.array([symbol for symbol, _ in rows], dtype=object)
+
+        self.exchanges = np.array([item.get("exchange") or "" for _, item in rows], dtype=object)
+
+        sectors = sectors or {}
+
+        self.sectors = np.array([sectors.get(symbol, "Unknown") for symbol in self.symbols], dtype=object)
+
+        def column(name):
+            return np.array([float(item.get(name) or 0) for _, item in rows], dtype=np.float64)
+
+        self.quantity = column("quantity")
+
+        self.average_price = column("average_price")
+
+        self.last_price = column("last_price")
+
+        close_price = column("close_price")
+
+        # Without a close price there is no day change to report.
+        self.close_price = np.where(close_price > 0, close_price, self.last_price)
+
+        self._compute()
+
+    # ---------------------------------------------------
+
+    def _compute(self):
+
+        self.invested_value = self.quantity * self.average_price
+
+        self.current_value = self.quantity * self.last_price
+
+        self.pnl = self.current_value - self.invested_value
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+
+            self.pnl_percentage = np.where(
+                self.average_price != 0,
+                (self.last_price - self.average_price) / self.average_price * 100.0,
+                0.0
+            )
+
+            self.day_change = self.last_price - self.close_price
+
+            self.day_change_value = self.quantity * self.day_change
+
+            self.day_change_percentage = np.where(
+                self.close_price != 0,
+                self.day_change / self.close_price * 100.0,
+                0.0
+            )
+
+            total = self.current_value.sum()
+
+            self.weight = self.current_value / total * 100.0 if total else np.zeros_like(self.current_value)
+
+    # ---------------------------------------------------
+
+    def __len__(self):
+
+        return len(self.symbols)
+
+    # ---------------------------------------------------
+
+    def arrays(self):
+        """
+        The underlying column arrays (views, not copies).
+        """
+
+        return {
+            "tradingsymbol": self.symbols,
+            "exchange": self.exchanges,
+            "sector": self.sectors,
+            "quantity": self.quantity,
+            "average_price": self.average_price,
+            "last_price": self.last_price,
+            "close_price": self.close_price,
+            "invested_value": self.invested_value,
+            "current_value": self.current_value,
+            "pnl": self.pnl,
+            "pnl_percentage": self.pnl_percentage,
+            "day_change": self.day_change,
+            "day_change_value": self.day_change_value,
+            "day_change_percentage": self.day_change_percentage,
+            "weight": self.weight,
+        }
+
+    # ---------------------------------------------------
+
+    def records(self):
+        """
+        One plain dict per holding with every metric.
+        """
+
+        arrays = self.arrays()
+
+        columns = {
+            name: values.tolist()
+            for name, values in arrays.items()
+        }
+
+        return [
+            {name: columns[name][index] for name in columns}
+            for index in range(len(self))
+        ]
+
+    # ---------------------------------------------------
+
+    def totals(self):
+
+        invested = float(self.invested_value.sum())
+
+        current = float(self.current_value.sum())
+
+        return {
+            "invested_value": invested,
+            "current_value": current,
+            "pnl": current - invested,
+            "pnl_percentage": (current - invested) / invested * 100.0 if invested else 0.0,
+            "day_change_value": float(self.day_change_value.sum()),
+        }
+
+    # ---------------------------------------------------
+
+    def aggregate(self, by="exchange"):
+        """
+        Totals per exchange or sector: {group: {invested_value,
+        current_value, pnl, pnl_percentage, day_change_value, weight}}.
+        """
+
+        keys = {"exchange": self.exchanges, "sector": self.sectors}[by]
+
+        if not len(keys):
+            return {}
+
+        groups, inverse = np.unique(keys.astype(str), return_inverse=True)
+
+        def total(values):
+            return np.bincount(inverse, weights=values, minlength=len(groups))
+
+        invested = total(self.invested_value)
+
+        current = total(self.current_value)
+
+        day_change = total(self.day_change_value)
+
+        grand_total = current.sum()
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pnl_percentage = np.where(invested != 0, (current - invested) / invested * 100.0, 0.0)
+
+        return {
+            str(group): {
+                "invested_value": float(invested[index]),
+                "current_value": float(current[index]),
+                "pnl": float(current[index] - invested[index]),
+                "pnl_percentage": float(pnl_percentage[index]),
+                "day_change_value": float(day_change[index]),
+                "weight": float(current[index] / grand_total * 100.0) if grand_total else 0.0,
+            }
+            for index, group in enumerate(groups)
+        }
+
+
+def holdings_analytics(path=None, section="holdings", sectors=None):
+    """
+    HoldingsAnalytics for a snapshot section, cached until the
+    snapshot file changes. `sectors` maps tradingsymbol -> sector.
+    """
+
+    path = str(path or DEFAULT_PATH)
+
+    data = load_portfolio_cached(path, sections=(section,))
+
+    key = ("analytics", path, section)
+
+    with _cache_lock:
+
+        cached = _cache.get(key)
+
+        if sectors is None and cached is not None and cached[0] is data:
+            return cached[1]
+
+    records = data.get(section) if isinstance(data, dict) else None
+
+    analytics = HoldingsAnalytics(records if isinstance(records, list) else [], sectors=sectors)
+
+    if sectors is None:
+        with _cache_lock:
+            _cache[key] = (data, analytics)
+
+    return analytics
@@ -0,0 +1,399 @@
+"""
+instrument_store.py
+
+Local cache of the Kite instrument master.
+
+The full instrument dump is downloaded once a day and written to a
+compact binary file: fixed-size records, sorted index tables by
+instrument_token, exchange:tradingsymbol, tradingsymbol and ISIN, and
+a string pool. Later loads only mmap that file; lookups binary-search
+the index tables in place, so they need no network, no CSV parsing
+and no index building on startup.
+"""
+
+import bisect
+import datetime
+import mmap
+import os
+import struct
+from pathlib import Path
+
+
+MAGIC = b"ZINS"
+
+VERSION = 2
+
+# magic, version, record count, string pool offset, offsets of the
+# token / symbol / tradingsymbol / ISIN tables, ISIN table entries
+HEADER = struct.Struct("<4sHIQQQQQI")
+
+# String fields, stored as (offset, length) into the string pool.
+STRING_FIELDS = ("tradingsymbol", "name", "instrument_type", "segment", "exchange", "isin")
+
+# instrument_token, exchange_token, last_price, strike, tick_size,
+# lot_size, expiry (date ordinal, 0 when none), then the string refs.
+RECORD = struct.Struct("<IIdddIi" + "IH" * len(STRING_FIELDS))
+
+# Index table entries: (instrument_token, record index) and
+# (key offset, key length, record index), sorted by key.
+TOKEN_ENTRY = struct.Struct("<II")
+
+KEY_ENTRY = struct.Struct("<IHI")
+
+DEFAULT_DIR = Path(__file__).resolve().parent / "data" / "instruments"
+
+
+class _IndexTable:
+    """
+    A sorted index table in the mapped file. Indexing it yields the
+    keys, so bisect can search it without reading it all.
+    """
+
+    def __init__(self, buffer, offset, count, entry, pool_offset=None):
+
+        self.buffer = buffer
+
+        self.offset = offset
+
+        self.count = count
+
+        self.entry = entry
+
+        self.pool_offset = pool_offset
+
+    def __len__(self):
+
+        return self.count
+
+    def _entry(self, position):
+
+        return self.entry.unpack_from(self.buffer, self.offset + position * self.entry.size)
+
+    def __getitem__(self, position):
+
+        fields = self._entry(position)
+
+        if self.pool_offset is None:
+            return fields[0]
+
+        start = self.pool_offset + fields[0]
+
+        return self.buffer[start:start + fields[1]]
+
+    def lookup(self, key):
+        """
+        Record indexes stored under `key`, in file order.
+        """
+
+        if self.pool_offset is not None:
+            key = key.encode("utf-8")
+
+        lower = bisect.bisect_left(self, key)
+
+        upper = bisect.bisect_right(self, key, lower)
+
+        return [self._entry(position)[-1] for position in range(lower, upper)]
+
+
+class InstrumentStore:
+
+    def __init__(self, client, data_dir=None):
+
+        self.client = client
+
+        self.data_dir = Path(data_dir) if data_dir else DEFAULT_DIR
+
+        self.path = None
+
+        self.file = None
+
+        self.buffer = None
+
+        self.count = 0
+
+        self.pool_offset = 0
+
+        self.by_token = None
+
+        self.by_symbol = None
+
+        self.by_tradingsymbol = None
+
+        self.by_isin = None
+
+    # ---------------------------------------------------
+
+    def load(self, day=None):
+        """
+        mmap today's instrument file, downloading it first
+        if it does not exist yet.
+        """
+
+        day = day or datetime.date.today()
+
+        path = self.data_dir / f"instruments-{day:%Y%m%d}.bin"
+
+        if not self._is_current(path):
+            self._download(path)
+            self._prune(keep=path)
+
+        self._open(path)
+
+        return self
+
+    # ---------------------------------------------------
+
+    def close(self):
+
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    # ---------------------------------------------------
+
+    def _download(self, path):
+
+        instruments = self.client.get_instruments()
+
+        # The instrument dump has no ISINs, take them from the holdings.
+        isins = {
+            item["instrument_token"]: item.get("isin") or ""
+            for item in self.client.get_holdings()
+        }
+
+        self.write(path, instruments, isins)
+
+    # ---------------------------------------------------
+
+    @staticmethod
+    def write(path, instruments, isins=None):
+        """
+        Write instrument dicts (as returned by kite.instruments)
+        to `path` in the binary store format, atomically.
+        """
+
+        isins = isins or {}
+
+        pool = bytearray()
+
+        pool_index = {}
+
+        records = bytearray()
+
+        token_entries = []
+
+        symbol_entries = []
+
+        tradingsymbol_entries = []
+
+        isin_entries = []
+
+        def intern(value):
+
+            encoded = str(value or "").encode("utf-8")
+
+            if encoded not in pool_index:
+                pool_index[encoded] = len(pool)
+                pool.extend(encoded)
+
+            return pool_index[encoded], len(encoded)
+
+        for index, item in enumerate(instruments):
+
+            token = int(item["instrument_token"])
+
+            expiry = item.get("expiry")
+
+            strings = []
+
+            for field in STRING_FIELDS:
+                value = isins.get(token, item.get("isin")) if field == "isin" else item.get(field)
+                strings.extend(intern(value))
+
+            tradingsymbol = str(item.get("tradingsymbol") or "")
+
+            isin = str(isins.get(token, item.get("isin")) or "")
+
+            token_entries.append((token, index))
+
+            symbol_entries.append((f"{item.get('exchange') or ''}:{tradingsymbol}".encode("utf-8"), index))
+
+            tradingsymbol_entries.append((tradingsymbol.encode("utf-8"), index))
+
+            if isin:
+                isin_entries.append((isin.encode("utf-8"), index))
+
+            records.extend(RECORD.pack(
+                token,
+                int(item.get("exchange_token") or 0),
+                float(item.get("last_price") or 0),
+                float(item.get("strike") or 0),
+                float(item.get("tick_size") or 0),
+                int(item.get("lot_size") or 0),
+                expiry.toordinal() if isinstance(expiry, datetime.date) else 0,
+                *strings
+            ))
+
+        tables = [b"".join(TOKEN_ENTRY.pack(*entry) for entry in sorted(token_entries))]
+
+        for entries in (symbol_entries, tradingsymbol_entries, isin_entries):
+            tables.append(b"".join(
+                KEY_ENTRY.pack(*intern(key.decode("utf-8")), index)
+                for key, index in sorted(entries)
+            ))
+
+        offsets = []
+
+        offset = HEADER.size + len(records)
+
+        for table in tables:
+            offsets.append(offset)
+            offset += len(table)
+
+        path = Path(path)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        temp_path = path.with_name(path.name + ".tmp")
+
+        with temp_path.open("wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, len(records) // RECORD.size, offset, *offsets, len(isin_entries)))
+            file.write(records)
+            for table in tables:
+                file.write(table)
+            file.write(pool)
+
+        os.replace(temp_path, path)
+
+    # ---------------------------------------------------
+
+    def _prune(self, keep):
+
+        for old in self.data_dir.glob("instruments-*.bin"):
+            if old != keep:
+                old.unlink()
+
+    # ---------------------------------------------------
+
+    @staticmethod
+    def _is_current(path):
+        """
+        True if `path` exists and is in this version's format
+        (files written by an older version are downloaded again).
+        """
+
+        if not path.exists():
+            return False
+
+        with path.open("rb") as file:
+            header = file.read(HEADER.size)
+
+        return len(header) == HEADER.size and HEADER.unpack(header)[:2] == (MAGIC, VERSION)
+
+    # ---------------------------------------------------
+
+    def _open(self, path):
+
+        self.close()
+
+        self.path = path
+
+        self.file = path.open("rb")
+
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count, self.pool_offset, *offsets, isin_count = HEADER.unpack_from(self.buffer, 0)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not an instrument store file: {path}")
+
+        token_offset, symbol_offset, tradingsymbol_offset, isin_offset = offsets
+
+        self.by_token = _IndexTable(self.buffer, token_offset, self.count, TOKEN_ENTRY)
+
+        self.by_symbol = _IndexTable(self.buffer, symbol_offset, self.count, KEY_ENTRY, self.pool_offset)
+
+        self.by_tradingsymbol = _IndexTable(self.buffer, tradingsymbol_offset, self.count, KEY_ENTRY, self.pool_offset)
+
+        self.by_isin = _IndexTable(self.buffer, isin_offset, isin_count, KEY_ENTRY, self.pool_offset)
+
+    # ---------------------------------------------------
+
+    def _record(self, index):
+
+        fields = RECORD.unpack_from(self.buffer, HEADER.size + index * RECORD.size)
+
+        record = {
+            "instrument_token": fields[0],
+            "exchange_token": fields[1],
+            "last_price": fields[2],
+            "strike": fields[3],
+            "tick_size": fields[4],
+            "lot_size": fields[5],
+            "expiry": datetime.date.fromordinal(fields[6]) if fields[6] else "",
+        }
+
+        for position, field in enumerate(STRING_FIELDS):
+            offset, length = fields[7 + 2 * position], fields[8 + 2 * position]
+            start = self.pool_offset + offset
+            record[field] = self.buffer[start:start + length].decode("utf-8")
+
+        return record
+
+    # ---------------------------------------------------
+
+    def __len__(self):
+
+        return self.count
+
+    # ---------------------------------------------------
+
+    def get(self, symbol):
+        """
+        Instrument for "EXCHANGE:TRADINGSYMBOL", or None.
+        """
+
+        indexes = self.by_symbol.lookup(symbol)
+
+        return self._record(indexes[0]) if indexes else None
+
+    # ---------------------------------------------------
+
+    def get_by_token(self, instrument_token):
+
+        indexes = self.by_token.lookup(int(instrument_token))
+
+        return self._record(indexes[0]) if indexes else None
+
+    # ---------------------------------------------------
+
+    def find(self, tradingsymbol):
+        """
+        All instruments with this tradingsymbol, across exchanges.
+        """
+
+        return [self._record(index) for index in self.by_tradingsymbol.lookup(tradingsymbol)]
+
+    # ---------------------------------------------------
+
+    def find_by_isin(self, isin):
+
+        return [self._record(index) for index in self.by_isin.lookup(isin)]
+
+    # ---------------------------------------------------
+
+    def token(self, symbol):
+        """
+        instrument_token for "EXCHANGE:TRADINGSYMBOL", or None.
+        """
+
+        indexes = self.by_symbol.lookup(symbol)
+
+        if not indexes:
+            return None
+
+        return struct.unpack_from("<I", self.buffer, HEADER.size + indexes[0] * RECORD.size)[0]
@@ -0,0 +1,416 @@
+"""
+kite_stub.py
+
+Local stand-in for the Kite Connect API.
+
+Serves the broker login page (answering with the usual redirect to the
+app's callback URL carrying a request_token) and the session token
+exchange, so ZerodhaClient.login can be run and timed headlessly.
+
+Data endpoints (profile, holdings, positions, orders, trades, margins,
+quote and LTP) answer from a recorded portfolio snapshot, with an
+optional per-request latency and the Kite per-second rate limits
+(HTTP 429 when exceeded), so the client can be measured offline.
+"""
+
+import json
+import random
+import secrets
+import threading
+import time
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from rate_limiter import RATE_LIMITS, TokenBucket
+
+
+DEFAULT_RECORDING = Path(__file__).resolve().parent / "data" / "portfolio.json"
+
+# API path -> recorded section
+DATA_ROUTES = {
+    "/user/profile": "profile",
+    "/portfolio/holdings": "holdings",
+    "/portfolio/positions": "positions",
+    "/orders": "orders",
+    "/trades": "trades",
+    "/user/margins": "margins",
+}
+
+# API path -> Kite rate-limit class
+ENDPOINT_CLASSES = {
+    "/orders": "order",
+    "/trades": "order",
+    "/quote": "quote",
+    "/quote/ltp": "quote",
+}
+
+
+def load_recording(path=None):
+    """
+    Stub responses from a saved portfolio snapshot
+    (as written by save_portfolio_json).
+    """
+
+    from portfolio_io import load_portfolio
+
+    portfolio = load_portfolio(path or DEFAULT_RECORDING)
+
+    return {
+        "profile": portfolio.get("profile") or {},
+        "holdings": portfolio.get("holdings") or [],
+        "positions": portfolio.get("positions") or {"net": [], "day": []},
+        "orders": portfolio.get("orders") or [],
+        "trades": portfolio.get("trades") or [],
+        "margins": portfolio.get("funds") or {},
+    }
+
+
+class KiteStubHandler(BaseHTTPRequestHandler):
+
+    # Keep-alive, like the real API.
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+
+        stub = self.server.stub
+
+        parsed = urlparse(self.path)
+
+        if parsed.path in DATA_ROUTES or parsed.path in ("/quote", "/quote/ltp"):
+
+            if not self._admit(parsed.path):
+                return
+
+            if parsed.path in DATA_ROUTES:
+                self._send_data(stub.recording[DATA_ROUTES[parsed.path]])
+            else:
+                symbols = parse_qs(parsed.query).get("i", [])
+                self._send_data(stub.quotes(symbols, ltp_only=parsed.path == "/quote/ltp"))
+
+            return
+
+        if parsed.path == "/connect/login":
+
+            time.sleep(stub.login_delay)
+
+            request_token = secrets.token_hex(16)
+
+            stub.request_tokens.add(request_token)
+
+            self.send_response(302)
+
+            self.send_header(
+                "Location",
+                f"{stub.redirect_url}?action=login&type=login&status=success"
+                f"&request_token={request_token}"
+            )
+
+            self.send_header("Content-Length", "0")
+
+            self.end_headers()
+
+            return
+
+        self._send_error(404, "GeneralException", "Route not found")
+
+    def do_POST(self):
+
+        stub = self.server.stub
+
+        parsed = urlparse(self.path)
+
+        length = int(self.headers.get("Content-Length") or 0)
+
+        params = parse_qs(self.rfile.read(length).decode("utf-8"))
+
+        if parsed.path == "/session/token":
+
+            request_token = params.get("request_token", [""])[0]
+
+            if request_token not in stub.request_tokens:
+                self._send_error(403, "TokenException", "Token is invalid or has expired.")
+                return
+
+            stub.request_tokens.discard(request_token)
+
+            access_token = secrets.token_hex(16)
+
+            stub.access_tokens.add(access_token)
+
+            self._send_json(200, {
+                "status": "success",
+                "data": {
+                    "user_id": stub.user_id,
+                    "user_name": "Stub User",
+                    "access_token": access_token,
+                    "login_time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                },
+            })
+
+            return
+
+        self._send_error(404, "GeneralException", "Route not found")
+
+    def _admit(self, path):
+        """
+        Check the access token, apply the configured latency and the
+        rate limit. Sends the error response and returns False when
+        the request is refused.
+        """
+
+        stub = self.server.stub
+
+        authorization = self.headers.get("Authorization") or ""
+
+        access_token = authorization.rpartition(":")[2]
+
+        if access_token not in stub.access_tokens:
+            self._send_error(403, "TokenException", "Incorrect `api_key` or `access_token`.")
+            return False
+
+        if not stub.allow(ENDPOINT_CLASSES.get(path, "default")):
+            self._send_error(429, "NetworkException", "Too many requests")
+            return False
+
+        delay = stub.latency + (random.uniform(0, stub.jitter) if stub.jitter else 0)
+
+        if delay:
+            time.sleep(delay)
+
+        with stub.lock:
+            stub.requests[path] = stub.requests.get(path, 0) + 1
+
+        return True
+
+    def _send_data(self, data):
+
+        self._send_json(200, {"status": "success", "data": data})
+
+    def _send_json(self, status, payload):
+
+        body = json.dumps(payload).encode("utf-8")
+
+        self.send_response(status)
+
+        self.send_header("Content-Type", "application/json")
+
+        self.send_header("Content-Length", str(len(body)))
+
+        self.end_headers()
+
+        self.wfile.write(body)
+
+    def _send_error(self, status, error_type, message):
+
+        self._send_json(status, {
+            "status": "error",
+            "error_type": error_type,
+            "message": message,
+            "data": None,
+        })
+
+    def log_message(self, format, *args):
+        # Suppress default HTTP logging
+        return
+
+
+class KiteStubServer:
+    """
+    Threaded local Kite stand-in. `redirect_url` is where the login page
+    sends the browser (the app's AuthServer); `login_delay` simulates the
+    time a user spends on the login page.
+
+    Data endpoints answer from `recording` (default: load_recording())
+    after `latency` seconds plus up to `jitter` more. `rate_limits`
+    maps endpoint class to requests per second (default: the Kite
+    limits; None disables them).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, redirect_url=None, login_delay=0.0, user_id="AB1234",
+                 recording=None, latency=0.0, jitter=0.0, rate_limits=RATE_LIMITS):
+
+        self.redirect_url = redirect_url
+
+        self.login_delay = login_delay
+
+        self.user_id = user_id
+
+        self.recording = recording if recording is not None else load_recording()
+
+        self.latency = latency
+
+        self.jitter = jitter
+
+        # One token of slack absorbs network jitter between the client's
+        # own scheduler and this server.
+        self.buckets = {
+            endpoint_class: TokenBucket(rate, capacity=rate + 1)
+            for endpoint_class, rate in (rate_limits or {}).items()
+        }
+
+        self.request_tokens = set()
+
+        self.access_tokens = set()
+
+        self.requests = {}
+
+        self.rate_limited = 0
+
+        self.lock = threading.Lock()
+
+        # Recorded quotes, keyed "EXCHANGE:TRADINGSYMBOL".
+        self.recorded_quotes = {
+            f"{item.get('exchange')}:{item.get('tradingsymbol')}": item
+            for item in self.recording.get("holdings") or []
+        }
+
+        self.server = ThreadingHTTPServer((host, port), KiteStubHandler)
+
+        self.server.stub = self
+
+        self.thread = None
+
+    def allow(self, endpoint_class):
+
+        bucket = self.buckets.get(endpoint_class)
+
+        if bucket is None or not bucket.try_acquire():
+            return True
+
+        with self.lock:
+            self.rate_limited += 1
+
+        return False
+
+    def quotes(self, symbols, ltp_only=False):
+        """
+        Quote (or LTP) payloads for "EXCHANGE:TRADINGSYMBOL" names:
+        recorded holdings where available, otherwise stable synthetic
+        prices derived from the symbol.
+        """
+
+        result = {}
+
+        for symbol in symbols:
+
+            recorded = self.recorded_quotes.get(symbol)
+
+            seed = zlib.crc32(symbol.encode("utf-8"))
+
+            if recorded is not None:
+                token = recorded.get("instrument_token") or seed % 10_000_000
+                last_price = recorded.get("last_price") or 0.0
+                close_price = recorded.get("close_price") or last_price
+            else:
+                token = seed % 10_000_000
+                last_price = round(10 + seed % 500_000 / 100, 2)
+                close_price = round(last_price * 0.99, 2)
+
+            if ltp_only:
+                result[symbol] = {"instrument_token": token, "last_price": last_price}
+                continue
+
+            result[symbol] = {
+                "instrument_token": token,
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "last_price": last_price,
+                "volume": seed % 1_000_000,
+                "net_change": round(last_price - close_price, 2),
+                "ohlc": {
+                    "open": close_price,
+                    "high": max(last_price, close_price),
+                    "low": min(last_price, close_price),
+                    "close": close_price,
+                },
+            }
+
+        return result
+
+    @property
+    def root(self):
+
+        host, port = self.server.server_address[:2]
+
+        return f"http://{host}:{port}"
+
+    @property
+    def login_uri(self):
+
+        return f"{self.root}/connect/login"
+
+    def start(self):
+
+        self.thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True
+        )
+
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+
+        self.server.shutdown()
+
+        self.server.server_close()
+
+    def stats(self):
+
+        with self.lock:
+            return {"requests": dict(self.requests), "rate_limited": self.rate_limited}
+
+
+def headless_open(url):
+    """
+    Stand-in for webbrowser.open: follow the login redirect with urllib.
+    """
+
+    with urllib.request.urlopen(url, timeout=30) as response:
+        response.read()
+
+
+def run_headless_login(env_file, login_delay=0.0, stub=None):
+    """
+    Run the full ZerodhaClient browser login against the stand-in,
+    storing tokens in `env_file`. Returns (client, seconds taken).
+    With a running `stub`, the client keeps using it afterwards.
+    """
+
+    from auth_server import AuthServer
+    from token_manager import TokenManager
+    from zerodha_client import ZerodhaClient
+
+    owned = stub is None
+
+    if owned:
+        stub = KiteStubServer(login_delay=login_delay).start()
+
+    try:
+        client = ZerodhaClient(
+            root=stub.root,
+            login_uri=stub.login_uri,
+            token_manager=TokenManager(env_file)
+        )
+
+        client.kite.api_key = client.config.API_KEY = client.config.API_KEY or "stub_api_key"
+
+        client.config.API_SECRET = client.config.API_SECRET or "stub_api_secret"
+
+        auth_server = AuthServer(port=0)
+
+        stub.redirect_url = auth_server.redirect_url
+
+        started = time.perf_counter()
+
+        client._authenticate(auth_server=auth_server, open_url=headless_open, timeout=30)
+
+        return client, time.perf_counter() - started
+
+    finally:
+        if owned:
+            stub.stop()
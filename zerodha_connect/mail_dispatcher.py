@@ -0,0 +1,431 @@
+"""
+mail_dispatcher.py
+
+Queued e-mail delivery over one reused SMTP session.
+
+Callers hand messages to send() and get a Future back straight away; a
+background worker delivers them. The worker keeps the SMTP connection
+(STARTTLS + login done once) open between messages, checks it with NOOP
+when it has been idle, and reconnects when the server dropped it.
+Messages for the same recipients that arrive within `digest_window`
+seconds of each other are merged into a single digest e-mail. Every
+message reports its latency from send() to delivery.
+"""
+
+import atexit
+import html
+import os
+import queue
+import smtplib
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from metrics import RECENT_SAMPLES, get_metrics
+
+
+# Sessions idle for longer than this are checked with NOOP before use.
+STALE_AFTER = 30.0
+
+_STOP = object()
+
+
+class MailDispatcher:
+
+    def __init__(
+        self,
+        host,
+        port=587,
+        sender=None,
+        username=None,
+        password=None,
+        use_tls=True,
+        digest_window=0.0,
+        stale_after=STALE_AFTER,
+        timeout=30
+    ):
+
+        self.host = host
+
+        self.port = port
+
+        self.sender = sender or username
+
+        self.username = username
+
+        self.password = password
+
+        self.use_tls = use_tls
+
+        self.digest_window = digest_window
+
+        self.stale_after = stale_after
+
+        self.timeout = timeout
+
+        self.queue = queue.Queue()
+
+        self.smtp = None
+
+        self.last_used = 0.0
+
+        # Latencies of the most recent deliveries, for stats().
+        self.latencies = deque(maxlen=RECENT_SAMPLES)
+
+        self.sent = 0
+
+        self.connects = 0
+
+        self.failures = 0
+
+        self.lock = threading.Lock()
+
+        self.worker = threading.Thread(target=self._run, name="mail-dispatcher", daemon=True)
+
+        self.worker.start()
+
+    # ---------------------------------------------------
+
+    def send(self, subject, html_body=None, plain_body=None, to=None):
+        """
+        Queue a message and return a Future that resolves to its
+        latency in seconds once it was delivered.
+        """
+
+        recipients = to if isinstance(to, (list, tuple)) else [to]
+
+        recipients = tuple(recipient for recipient in recipients if recipient)
+
+        if not recipients:
+            raise ValueError("A mail needs at least one recipient.")
+
+        future = Future()
+
+        self.queue.put({
+            "subject": subject,
+            "html": html_body,
+            "plain": plain_body,
+            "to": recipients,
+            "queued_at": time.perf_counter(),
+            "future": future,
+        })
+
+        return future
+
+    # ---------------------------------------------------
+
+    def flush(self, timeout=None):
+        """
+        Block until every queued message was handled.
+        """
+
+        done = threading.Event()
+
+        self.queue.put(done)
+
+        return done.wait(timeout)
+
+    # ---------------------------------------------------
+
+    def close(self, timeout=None):
+        """
+        Deliver what is queued, then stop the worker and QUIT.
+        """
+
+        if not self.worker.is_alive():
+            return
+
+        self.queue.put(_STOP)
+
+        self.worker.join(timeout)
+
+    # ---------------------------------------------------
+
+    def stats(self):
+        """
+        Counters since start; latencies over the recent deliveries.
+        """
+
+        with self.lock:
+            latencies = sorted(self.latencies)
+            sent = self.sent
+            connects = self.connects
+            failures = self.failures
+
+        count = len(latencies)
+
+        return {
+            "sent": sent,
+            "failed": failures,
+            "connections": connects,
+            "queued": self.queue.qsize(),
+            "avg_latency": sum(latencies) / count if count else 0.0,
+            "p95_latency": latencies[min(count - 1, int(count * 0.95))] if count else 0.0,
+            "max_latency": latencies[-1] if count else 0.0,
+        }
+
+    # ---------------------------------------------------
+
+    def _run(self):
+
+        while True:
+
+            item = self.queue.get()
+
+            if item is _STOP:
+                self._disconnect()
+                return
+
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+
+            batch = [item]
+
+            markers = []
+
+            stop = False
+
+            # Collect whatever else arrives within the digest window.
+            if self.digest_window > 0:
+
+                deadline = time.monotonic() + self.digest_window
+
+                while True:
+
+                    remaining = deadline - time.monotonic()
+
+                    if remaining <= 0:
+                        break
+
+                    try:
+                        extra = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+
+                    if extra is _STOP:
+                        stop = True
+                        break
+
+                    if isinstance(extra, threading.Event):
+                        markers.append(extra)
+                        break
+
+                    batch.append(extra)
+
+            groups = {}
+
+            for message in batch:
+                groups.setdefault(message["to"], []).append(message)
+
+            for recipients, messages in groups.items():
+                try:
+                    self._deliver(recipients, messages)
+                except Exception as error:
+                    # Keep the worker alive and never leave a sender waiting.
+                    self._fail(messages, error)
+
+            for marker in markers:
+                marker.set()
+
+            if stop:
+                self._disconnect()
+                return
+
+    # ---------------------------------------------------
+
+    def _deliver(self, recipients, messages):
+
+        try:
+            mime = _build_digest(messages) if len(messages) > 1 else _build_message(messages[0])
+
+            mime["From"] = self.sender
+
+            mime["To"] = ", ".join(recipients)
+
+            self._send_mime(mime, recipients)
+
+        except Exception as error:
+            self._fail(messages, error)
+            return
+
+        sent_at = time.perf_counter()
+
+        for message in messages:
+
+            latency = sent_at - message["queued_at"]
+
+            with self.lock:
+                self.latencies.append(latency)
+                self.sent += 1
+
+            message["future"].set_result(latency)
+
+    # ---------------------------------------------------
+
+    def _fail(self, messages, error):
+
+        pending = [message for message in messages if not message["future"].done()]
+
+        with self.lock:
+            self.failures += len(pending)
+
+        for message in pending:
+            message["future"].set_exception(error)
+
+    # ---------------------------------------------------
+
+    def _send_mime(self, mime, recipients):
+
+        for attempt in range(2):
+
+            smtp = self._session()
+
+            try:
+                smtp.send_message(mime, from_addr=self.sender, to_addrs=list(recipients))
+                self.last_used = time.monotonic()
+                return
+
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # The server dropped the session; reconnect once.
+                self._disconnect()
+                if attempt:
+                    raise
+
+    # ---------------------------------------------------
+
+    def _session(self):
+
+        if self.smtp is not None and time.monotonic() - self.last_used > self.stale_after:
+
+            try:
+                code = self.smtp.noop()[0]
+            except (smtplib.SMTPException, OSError):
+                code = None
+
+            if code != 250:
+                self._disconnect()
+
+        if self.smtp is None:
+            self._connect()
+
+        return self.smtp
+
+    # ---------------------------------------------------
+
+    def _connect(self):
+
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+
+        try:
+            if self.use_tls:
+                smtp.starttls()
+
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+
+        except Exception:
+            smtp.close()
+            raise
+
+        self.smtp = smtp
+
+        self.last_used = time.monotonic()
+
+        with self.lock:
+            self.connects += 1
+
+    # ---------------------------------------------------
+
+    def _disconnect(self):
+
+        if self.smtp is None:
+            return
+
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+
+        self.smtp = None
+
+
+def _build_message(message):
+
+    mime = MIMEMultipart("alternative")
+
+    mime["Subject"] = message["subject"]
+
+    mime.attach(MIMEText(message["plain"] or "", "plain"))
+
+    if message["html"]:
+        mime.attach(MIMEText(message["html"], "html"))
+
+    return mime
+
+
+def _build_digest(messages):
+    """
+    One e-mail holding several queued messages, each under its subject.
+    """
+
+    mime = MIMEMultipart("alternative")
+
+    mime["Subject"] = f"[SP] Digest - {len(messages)} notifications"
+
+    plain = "\n\n".join(
+        f"{message['subject']}\n{message['plain'] or ''}"
+        for message in messages
+    )
+
+    html_body = "".join(
+        f"<h3>{html.escape(message['subject'] or '')}</h3>"
+        f"{message['html'] or '<p>' + html.escape(message['plain'] or '') + '</p>'}"
+        for message in messages
+    )
+
+    mime.attach(MIMEText(plain, "plain"))
+
+    mime.attach(MIMEText(html_body, "html"))
+
+    return mime
+
+
+_dispatcher = None
+
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """
+    The dispatcher shared by this process, configured from the
+    EMAIL_* / SMTP_* environment variables. Queued mail is flushed
+    when the interpreter exits.
+    """
+
+    global _dispatcher
+
+    with _dispatcher_lock:
+
+        if _dispatcher is None:
+
+            sender = os.getenv("EMAIL_SENDER")
+
+            _dispatcher = MailDispatcher(
+                host=os.getenv("SMTP_HOST", "smtp.gmail.com"),
+                port=int(os.getenv("SMTP_PORT", "587")),
+                sender=sender,
+                username=sender,
+                password=os.getenv("EMAIL_PASSWORD"),
+                use_tls=os.getenv("SMTP_STARTTLS", "1") != "0",
+                digest_window=float(os.getenv("MAIL_DIGEST_WINDOW", "0"))
+            )
+
+            atexit.register(_dispatcher.close)
+
+            get_metrics().add_collector("mail", _dispatcher.stats)
+
+        return _dispatcher
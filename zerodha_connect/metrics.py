@@ -0,0 +1,452 @@
+"""
+metrics.py
+
+Call metrics for the Zerodha clients.
+
+Every Kite request made through ZerodhaClient._call (and
+AsyncZerodhaClient._get) is recorded per endpoint: a latency histogram,
+call and error counts (by exception type), seconds spent waiting on the
+rate limiter, response bytes and retry / hedge events. Registered
+collectors add the quote cache, rate-limiter, circuit-breaker and mail
+dispatcher counters.
+
+The numbers are available in-process through snapshot() and as
+Prometheus text, optionally served over HTTP:
+
+    metrics = get_metrics()
+    metrics.serve(port=9108)      # GET http://127.0.0.1:9108/metrics
+"""
+
+import bisect
+import math
+import os
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Upper bounds (seconds) of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upstream latencies (rate-limit wait excluded) kept per endpoint for
+# quantile() and the p50 / p95 / p99 in snapshot().
+RECENT_SAMPLES = 256
+
+PREFIX = "zerodha"
+
+_local = threading.local()
+
+
+def response_hook(response, *args, **kwargs):
+    """
+    requests response hook counting body bytes for the call
+    running on this thread (see take_response_bytes).
+    """
+
+    _local.response_bytes = getattr(_local, "response_bytes", 0) + len(response.content)
+
+
+def take_response_bytes():
+    """
+    Bytes received on this thread since the last call, then reset.
+    """
+
+    received = getattr(_local, "response_bytes", 0)
+
+    _local.response_bytes = 0
+
+    return received
+
+
+def _quantile(samples, fraction):
+
+    if not samples:
+        return None
+
+    ordered = sorted(samples)
+
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def flat_samples(stats):
+    """
+    Prometheus samples of a flat {name: number} stats dict.
+    """
+
+    for name, value in stats.items():
+        if isinstance(value, (int, float)):
+            yield name, {}, value
+
+
+def scheduler_samples(stats):
+    """
+    Prometheus samples of RateLimitScheduler.stats().
+    """
+
+    for endpoint_class, class_stats in stats.items():
+
+        for lane, depth in class_stats["queue_depth"].items():
+            yield "queue_depth", {"endpoint_class": endpoint_class, "lane": lane}, depth
+
+        for name in ("requests", "avg_wait", "max_wait", "max_queue_depth"):
+            yield name, {"endpoint_class": endpoint_class}, class_stats[name]
+
+
+class _EndpointMetrics:
+
+    def __init__(self, endpoint_class):
+
+        self.endpoint_class = endpoint_class
+
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+        self.calls = 0
+
+        self.seconds = 0.0
+
+        self.wait_seconds = 0.0
+
+        self.response_bytes = 0
+
+        self.errors = {}
+
+        # Retries, hedges and other call-handling events by name.
+        self.events = {}
+
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+
+class CallMetrics:
+
+    def __init__(self):
+
+        self.endpoints = {}
+
+        self.collectors = {}
+
+        self.lock = threading.Lock()
+
+        self.server = None
+
+    # ---------------------------------------------------
+
+    def observe(self, endpoint, endpoint_class, seconds, error=None, response_bytes=0, waited=0.0):
+        """
+        Record one call. `error` is the exception type name of a
+        failed call, `waited` the seconds spent on the rate limiter.
+        """
+
+        with self.lock:
+
+            metrics = self.endpoints.get(endpoint)
+
+            if metrics is None:
+                metrics = self.endpoints[endpoint] = _EndpointMetrics(endpoint_class)
+
+            metrics.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+            metrics.calls += 1
+
+            metrics.seconds += seconds
+
+            metrics.wait_seconds += waited
+
+            metrics.response_bytes += response_bytes
+
+            metrics.recent.append(seconds - waited)
+
+            if error is not None:
+                metrics.errors[error] = metrics.errors.get(error, 0) + 1
+
+    # ---------------------------------------------------
+
+    def count(self, endpoint, endpoint_class, event):
+        """
+        Count a call-handling event such as "retry" or "hedge".
+        """
+
+        with self.lock:
+
+            metrics = self.endpoints.get(endpoint)
+
+            if metrics is None:
+                metrics = self.endpoints[endpoint] = _EndpointMetrics(endpoint_class)
+
+            metrics.events[event] = metrics.events.get(event, 0) + 1
+
+    # ---------------------------------------------------
+
+    def quantile(self, endpoint, fraction, min_samples=1):
+        """
+        Upstream latency quantile (seconds) over the recent calls to
+        an endpoint, or None with fewer than `min_samples` calls.
+        """
+
+        with self.lock:
+            metrics = self.endpoints.get(endpoint)
+            samples = list(metrics.recent) if metrics is not None else []
+
+        if len(samples) < min_samples:
+            return None
+
+        return _quantile(samples, fraction)
+
+    # ---------------------------------------------------
+
+    def add_collector(self, name, stats, samples=flat_samples):
+        """
+        Include `stats()` in snapshots under `name`; `samples` turns
+        its result into (metric, labels, value) for Prometheus.
+        Registering a name again replaces the collector.
+        """
+
+        with self.lock:
+            self.collectors[name] = (stats, samples)
+
+    # ---------------------------------------------------
+
+    def snapshot(self):
+        """
+        {"endpoints": {endpoint: {...}}, <collector>: stats, ...}
+        """
+
+        with self.lock:
+
+            endpoints = {}
+
+            for endpoint, metrics in self.endpoints.items():
+
+                recent = list(metrics.recent)
+
+                endpoints[endpoint] = {
+                    "endpoint_class": metrics.endpoint_class,
+                    "calls": metrics.calls,
+                    "errors": dict(metrics.errors),
+                    "events": dict(metrics.events),
+                    "seconds": metrics.seconds,
+                    "wait_seconds": metrics.wait_seconds,
+                    "response_bytes": metrics.response_bytes,
+                    "avg": metrics.seconds / metrics.calls if metrics.calls else 0.0,
+                    "p50": _quantile(recent, 0.50),
+                    "p95": _quantile(recent, 0.95),
+                    "p99": _quantile(recent, 0.99),
+                }
+
+            collectors = dict(self.collectors)
+
+        snapshot = {"endpoints": endpoints}
+
+        for name, (stats, _) in collectors.items():
+            snapshot[name] = stats()
+
+        return snapshot
+
+    # ---------------------------------------------------
+
+    def reset(self):
+
+        with self.lock:
+            self.endpoints.clear()
+
+    # ---------------------------------------------------
+
+    def render_prometheus(self):
+        """
+        Everything in Prometheus text exposition format.
+        """
+
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+        def sample(name, labels, value):
+            rendered = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+            lines.append(f"{PREFIX}_{name}{{{rendered}}} {_number(value)}" if rendered else f"{PREFIX}_{name} {_number(value)}")
+
+        with self.lock:
+
+            endpoints = sorted(self.endpoints.items())
+
+            family("call_duration_seconds", "histogram", "Kite call latency, rate-limit wait included.")
+
+            for endpoint, metrics in endpoints:
+
+                labels = {"endpoint": endpoint, "endpoint_class": metrics.endpoint_class}
+
+                cumulative = 0
+
+                for bound, count in zip(LATENCY_BUCKETS + (math.inf,), metrics.buckets):
+                    cumulative += count
+                    sample("call_duration_seconds_bucket", {**labels, "le": _number(bound)}, cumulative)
+
+                sample("call_duration_seconds_sum", labels, metrics.seconds)
+
+                sample("call_duration_seconds_count", labels, metrics.calls)
+
+            family("call_wait_seconds_total", "counter", "Seconds Kite calls waited on the rate limiter.")
+
+            for endpoint, metrics in endpoints:
+                sample("call_wait_seconds_total", {"endpoint": endpoint}, metrics.wait_seconds)
+
+            family("call_errors_total", "counter", "Failed Kite calls by exception type.")
+
+            for endpoint, metrics in endpoints:
+                for error, count in sorted(metrics.errors.items()):
+                    sample("call_errors_total", {"endpoint": endpoint, "error": error}, count)
+
+            family("call_events_total", "counter", "Retries, hedged requests, deadline and circuit-breaker events.")
+
+            for endpoint, metrics in endpoints:
+                for event, count in sorted(metrics.events.items()):
+                    sample("call_events_total", {"endpoint": endpoint, "event": event}, count)
+
+            family("response_bytes_total", "counter", "Kite response body bytes.")
+
+            for endpoint, metrics in endpoints:
+                sample("response_bytes_total", {"endpoint": endpoint}, metrics.response_bytes)
+
+            collectors = sorted(self.collectors.items())
+
+        for name, (stats, samples) in collectors:
+
+            seen = set()
+
+            for metric, labels, value in samples(stats()):
+
+                metric = f"{name}_{metric}"
+
+                if metric not in seen:
+                    seen.add(metric)
+                    family(metric, "gauge", f"{name} {metric[len(name) + 1:].replace('_', ' ')}.")
+
+                sample(metric, labels, value)
+
+        return "\n".join(lines) + "\n"
+
+    # ---------------------------------------------------
+
+    def serve(self, host="127.0.0.1", port=9108):
+        """
+        Serve render_prometheus() on GET /metrics from a background
+        thread. Pass port=0 for an ephemeral port. Returns the server.
+        """
+
+        if self.server is None:
+            self.server = MetricsServer(self, host, port).start()
+
+        return self.server
+
+
+def _escape(value):
+
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+
+    if value is None:
+        return "NaN"
+
+    if value == math.inf:
+        return "+Inf"
+
+    if isinstance(value, bool):
+        return str(int(value))
+
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = self.server.metrics.render_prometheus().encode("utf-8")
+
+        self.send_response(200)
+
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+
+        self.send_header("Content-Length", str(len(body)))
+
+        self.end_headers()
+
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Suppress default HTTP logging
+        return
+
+
+class MetricsServer:
+
+    def __init__(self, metrics, host="127.0.0.1", port=9108):
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+
+        self.server.daemon_threads = True
+
+        self.server.metrics = metrics
+
+        self.host = host
+
+        # The actual port, useful when binding port 0.
+        self.port = self.server.server_address[1]
+
+        self.thread = None
+
+    @property
+    def url(self):
+
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def start(self):
+
+        self.thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True
+        )
+
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+
+        self.server.shutdown()
+
+        self.server.server_close()
+
+
+_metrics = None
+
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """
+    The metrics shared by every client in this process. When
+    METRICS_PORT is set the Prometheus endpoint is started on it.
+    """
+
+    global _metrics
+
+    with _metrics_lock:
+
+        if _metrics is None:
+
+            _metrics = CallMetrics()
+
+            port = os.getenv("METRICS_PORT")
+
+            if port:
+                _metrics.serve(os.getenv("METRICS_HOST", "127.0.0.1"), int(port))
+
+        return _metrics
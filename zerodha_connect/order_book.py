@@ -0,0 +1,372 @@
+"""
+order_book.py
+
+Local order book, kept up to date incrementally.
+
+Kite only lists the whole day's orders and trades, so sync() still
+reads the order list once, but compares every order with what is
+stored and only writes the ones that are new or changed:
+
+- orders whose status moved on get their full status trail from
+  order_history (new orders start with the state they were listed in);
+- trades are fetched per order (order_trades) for the few orders whose
+  filled quantity grew, or with one trades call when many did, and only
+  unseen trade IDs are stored.
+
+Orders and trades live in SQLite, indexed by order ID, trade ID, symbol
+and the sync that last changed them. Every sync returns a cursor, and
+changes_after(cursor) / changed_since(time) read only the rows changed
+since then through those indexes, however large the book grows.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+DEFAULT_PATH = Path(__file__).resolve().parent / "data" / "order_book.db"
+
+# Order fields that identify a new state of an order.
+ORDER_STATE_FIELDS = (
+    "status", "filled_quantity", "pending_quantity", "cancelled_quantity",
+    "quantity", "price", "trigger_price", "average_price",
+    "exchange_update_timestamp", "status_message",
+)
+
+# Up to this many orders with new fills are read with order_trades,
+# more with a single trades call.
+ORDER_TRADES_LIMIT = 5
+
+
+def _timestamp(value):
+
+    if value is None:
+        return time.time()
+
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.astimezone()
+        return value.timestamp()
+
+    return float(value)
+
+
+def _dumps(item):
+
+    return json.dumps(item, default=str, separators=(",", ":"))
+
+
+def _fingerprint(order):
+
+    return _dumps([order.get(name) for name in ORDER_STATE_FIELDS])
+
+
+class OrderBook:
+
+    def __init__(self, path=None):
+
+        self.path = Path(path) if path else DEFAULT_PATH
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+
+        self.connection.execute("PRAGMA journal_mode=WAL")
+
+        self.lock = threading.Lock()
+
+        # One sync at a time; readers only wait for the final write.
+        self.sync_lock = threading.Lock()
+
+        self._create_schema()
+
+        # order_id -> (fingerprint, status, filled_quantity) of the stored state
+        self.known_orders = {
+            order_id: (fingerprint, status, filled_quantity)
+            for order_id, fingerprint, status, filled_quantity in self.connection.execute(
+                "SELECT order_id, fingerprint, status, filled_quantity FROM orders"
+            )
+        }
+
+        self.known_trades = {row[0] for row in self.connection.execute("SELECT trade_id FROM trades")}
+
+    # ---------------------------------------------------
+
+    def close(self):
+
+        self.connection.close()
+
+    # ---------------------------------------------------
+
+    def _create_schema(self):
+
+        with self.connection:
+
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS syncs ("
+                "sync_id INTEGER PRIMARY KEY, "
+                "synced_at REAL NOT NULL)"
+            )
+
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS orders ("
+                "order_id TEXT PRIMARY KEY, "
+                "tradingsymbol TEXT, exchange TEXT, status TEXT, "
+                "filled_quantity INTEGER, order_timestamp TEXT, "
+                "fingerprint TEXT NOT NULL, data TEXT NOT NULL, "
+                "sync_id INTEGER NOT NULL)"
+            )
+
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS order_history ("
+                "order_id TEXT NOT NULL, position INTEGER NOT NULL, "
+                "status TEXT, data TEXT NOT NULL, "
+                "PRIMARY KEY (order_id, position))"
+            )
+
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS trades ("
+                "trade_id TEXT PRIMARY KEY, order_id TEXT, "
+                "tradingsymbol TEXT, exchange TEXT, fill_timestamp TEXT, "
+                "data TEXT NOT NULL, sync_id INTEGER NOT NULL)"
+            )
+
+            self.connection.execute("CREATE INDEX IF NOT EXISTS syncs_time ON syncs (synced_at)")
+
+            self.connection.execute("CREATE INDEX IF NOT EXISTS orders_sync ON orders (sync_id)")
+
+            self.connection.execute("CREATE INDEX IF NOT EXISTS orders_symbol ON orders (tradingsymbol)")
+
+            self.connection.execute("CREATE INDEX IF NOT EXISTS trades_sync ON trades (sync_id)")
+
+            self.connection.execute("CREATE INDEX IF NOT EXISTS trades_order ON trades (order_id)")
+
+    # ---------------------------------------------------
+
+    def sync(self, client, synced_at=None):
+        """
+        Bring the book up to date through a ZerodhaClient. Returns
+        {"cursor", "orders", "trades", "history_calls", "trade_calls"}
+        where orders / trades are the new or changed records.
+        """
+
+        with self.sync_lock:
+            return self._sync(client, _timestamp(synced_at))
+
+    # ---------------------------------------------------
+
+    def _sync(self, client, synced_at):
+
+        listed = client.get_orders() or []
+
+        changed = []
+
+        moved = []
+
+        filled = []
+
+        for order in listed:
+
+            order_id = str(order["order_id"])
+
+            fingerprint = _fingerprint(order)
+
+            known = self.known_orders.get(order_id)
+
+            if known is not None and known[0] == fingerprint:
+                continue
+
+            changed.append((order_id, order, fingerprint))
+
+            if known is not None and known[1] != order.get("status"):
+                moved.append(order_id)
+
+            if (order.get("filled_quantity") or 0) > (known[2] if known else 0):
+                filled.append(order_id)
+
+        histories = {order_id: client.get_order_history(order_id) for order_id in moved}
+
+        trade_calls = 0
+
+        if len(filled) > ORDER_TRADES_LIMIT:
+            trades = client.get_trades() or []
+            trade_calls = 1
+        else:
+            trades = []
+            for order_id in filled:
+                trades += client.get_order_trades(order_id) or []
+                trade_calls += 1
+
+        new_trades = {}
+
+        for trade in trades:
+
+            trade_id = str(trade["trade_id"])
+
+            if trade_id not in self.known_trades:
+                new_trades[trade_id] = trade
+
+        with self.lock, self.connection:
+
+            cursor = self.connection.execute(
+                "INSERT INTO syncs (synced_at) VALUES (?)",
+                (synced_at,)
+            ).lastrowid
+
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO orders (order_id, tradingsymbol, exchange, status, "
+                "filled_quantity, order_timestamp, fingerprint, data, sync_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        order_id, order.get("tradingsymbol"), order.get("exchange"),
+                        order.get("status"), order.get("filled_quantity") or 0,
+                        str(order.get("order_timestamp") or ""), fingerprint,
+                        _dumps(order), cursor,
+                    )
+                    for order_id, order, fingerprint in changed
+                ]
+            )
+
+            for order_id, order, _ in changed:
+
+                # New orders start their trail with the state they were
+                # listed in; orders that moved on get Kite's full trail.
+                trail = histories.get(order_id)
+
+                if trail is None:
+                    if order_id in self.known_orders:
+                        continue
+                    trail = [order]
+
+                self.connection.execute("DELETE FROM order_history WHERE order_id = ?", (order_id,))
+
+                self.connection.executemany(
+                    "INSERT INTO order_history (order_id, position, status, data) VALUES (?, ?, ?, ?)",
+                    [
+                        (order_id, position, state.get("status"), _dumps(state))
+                        for position, state in enumerate(trail)
+                    ]
+                )
+
+            self.connection.executemany(
+                "INSERT INTO trades (trade_id, order_id, tradingsymbol, exchange, "
+                "fill_timestamp, data, sync_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        trade_id, str(trade.get("order_id") or ""), trade.get("tradingsymbol"),
+                        trade.get("exchange"), str(trade.get("fill_timestamp") or ""),
+                        _dumps(trade), cursor,
+                    )
+                    for trade_id, trade in new_trades.items()
+                ]
+            )
+
+        for order_id, order, fingerprint in changed:
+            self.known_orders[order_id] = (fingerprint, order.get("status"), order.get("filled_quantity") or 0)
+
+        self.known_trades.update(new_trades)
+
+        return {
+            "cursor": cursor,
+            "orders": [order for _, order, _ in changed],
+            "trades": list(new_trades.values()),
+            "history_calls": len(moved),
+            "trade_calls": trade_calls,
+        }
+
+    # ---------------------------------------------------
+
+    def changes_after(self, cursor=0):
+        """
+        Orders and trades changed by syncs after `cursor` (a value
+        returned by sync), in their latest state:
+        {"cursor", "orders", "trades"}.
+        """
+
+        with self.lock:
+
+            orders = self.connection.execute(
+                "SELECT data FROM orders WHERE sync_id > ? ORDER BY sync_id",
+                (cursor,)
+            ).fetchall()
+
+            trades = self.connection.execute(
+                "SELECT data FROM trades WHERE sync_id > ? ORDER BY sync_id",
+                (cursor,)
+            ).fetchall()
+
+            latest = self.connection.execute("SELECT MAX(sync_id) FROM syncs").fetchone()[0]
+
+        return {
+            "cursor": latest or 0,
+            "orders": [json.loads(row[0]) for row in orders],
+            "trades": [json.loads(row[0]) for row in trades],
+        }
+
+    # ---------------------------------------------------
+
+    def changed_since(self, when):
+        """
+        changes_after() for the syncs made after `when`
+        (datetime or epoch seconds).
+        """
+
+        row = self.connection.execute(
+            "SELECT MAX(sync_id) FROM syncs WHERE synced_at <= ?",
+            (_timestamp(when),)
+        ).fetchone()
+
+        return self.changes_after(row[0] or 0)
+
+    # ---------------------------------------------------
+
+    def order(self, order_id):
+
+        row = self.connection.execute(
+            "SELECT data FROM orders WHERE order_id = ?",
+            (str(order_id),)
+        ).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    # ---------------------------------------------------
+
+    def order_history(self, order_id):
+        """
+        Stored status trail of an order, oldest first.
+        """
+
+        cursor = self.connection.execute(
+            "SELECT data FROM order_history WHERE order_id = ? ORDER BY position",
+            (str(order_id),)
+        )
+
+        return [json.loads(row[0]) for row in cursor]
+
+    # ---------------------------------------------------
+
+    def order_trades(self, order_id):
+
+        cursor = self.connection.execute(
+            "SELECT data FROM trades WHERE order_id = ? ORDER BY fill_timestamp",
+            (str(order_id),)
+        )
+
+        return [json.loads(row[0]) for row in cursor]
+
+    # ---------------------------------------------------
+
+    def orders_for(self, tradingsymbol, status=None):
+
+        status_filter = " AND status = ?" if status else ""
+
+        cursor = self.connection.execute(
+            "SELECT data FROM orders WHERE tradingsymbol = ?" + status_filter + " ORDER BY order_timestamp",
+            (tradingsymbol, status) if status else (tradingsymbol,)
+        )
+
+        return [json.loads(row[0]) for row in cursor]
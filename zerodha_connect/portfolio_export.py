@@ -0,0 +1,148 @@
+"""
+portfolio_export.py
+
+Flattened, columnar export of a portfolio snapshot.
+
+Every section (holdings, positions net/day, orders, trades, funds)
+becomes its own table with one column per field. Nested objects such
+as `mtf` are flattened into prefixed columns (mtf_quantity, ...), so
+consumers can load columns directly instead of parsing JSON per row.
+Tables are streamed to CSV, or written to Parquet when pyarrow is
+available.
+"""
+
+import csv
+import json
+from pathlib import Path
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def flatten_record(record, prefix=""):
+    """
+    Flatten nested dicts into one level with "_"-joined keys.
+    Lists are kept as JSON text.
+    """
+
+    flat = {}
+
+    for key, value in record.items():
+
+        name = f"{prefix}{key}"
+
+        if isinstance(value, dict):
+            flat.update(flatten_record(value, prefix=f"{name}_"))
+        elif isinstance(value, (list, tuple)):
+            flat[name] = json.dumps(value, default=str)
+        else:
+            flat[name] = value
+
+    return flat
+
+
+def section_tables(portfolio):
+    """
+    {table name: list of raw records} for the tabular sections.
+    """
+
+    positions = portfolio.get("positions") or {}
+
+    funds = portfolio.get("funds") or {}
+
+    tables = {
+        "holdings": portfolio.get("holdings") or [],
+        "positions_net": positions.get("net") or [],
+        "positions_day": positions.get("day") or [],
+        "orders": portfolio.get("orders") or [],
+        "trades": portfolio.get("trades") or [],
+        "funds": [
+            dict(segment=segment, **(values or {}))
+            for segment, values in funds.items()
+        ],
+    }
+
+    return tables
+
+
+def _columns(records):
+    """
+    Union of flattened column names, in first-seen order.
+    """
+
+    columns = {}
+
+    for record in records:
+        for name in flatten_record(record):
+            columns.setdefault(name, None)
+
+    return list(columns)
+
+
+def write_flat_csv(portfolio, output_dir):
+    """
+    Stream every section into <output_dir>/<table>.csv.
+    Returns {table name: path}.
+    """
+
+    output_dir = Path(output_dir)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = {}
+
+    for table, records in section_tables(portfolio).items():
+
+        path = output_dir / f"{table}.csv"
+
+        columns = _columns(records)
+
+        with path.open("w", newline="", encoding="utf-8") as csv_file:
+
+            writer = csv.DictWriter(csv_file, fieldnames=columns)
+
+            writer.writeheader()
+
+            for record in records:
+                writer.writerow(flatten_record(record))
+
+        paths[table] = path
+
+    return paths
+
+
+def write_parquet(portfolio, output_dir):
+    """
+    Write every section to <output_dir>/<table>.parquet with typed
+    columns. Requires pyarrow.
+    """
+
+    if pyarrow is None:
+        raise RuntimeError("The 'pyarrow' package is required for Parquet export.")
+
+    output_dir = Path(output_dir)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = {}
+
+    for table, records in section_tables(portfolio).items():
+
+        path = output_dir / f"{table}.parquet"
+
+        columns = _columns(records)
+
+        rows = [flatten_record(record) for record in records]
+
+        arrow_table = pyarrow.Table.from_pylist(
+            [{name: row.get(name) for name in columns} for row in rows]
+        ) if rows else pyarrow.table({})
+
+        pyarrow.parquet.write_table(arrow_table, path)
+
+        paths[table] = path
+
+    return paths
@@ -0,0 +1,523 @@
+"""
+portfolio_io.py
+
+Reading and writing portfolio snapshots.
+
+Snapshots can be written as compact JSON, gzip- or zstd-compressed
+JSON, or MessagePack. Writes are streamed into a temp file that is
+renamed into place, and readers detect the format from the file's
+leading bytes.
+"""
+
+import gzip
+import io
+import json
+import re
+from pathlib import Path
+
+from file_utils import atomic_open
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+FORMATS = ("json", "json.gz", "json.zst", "msgpack")
+
+# File name suffix used for each format.
+SUFFIXES = {
+    "json": ".json",
+    "json.gz": ".json.gz",
+    "json.zst": ".json.zst",
+    "msgpack": ".msgpack",
+}
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Scanner used to skip unwanted JSON values: a whole string (group 1 is
+# empty when it runs past the end of the buffer) or a bracket.
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*(")?|[\[\]{}]')
+
+_SCALAR_END = re.compile(r'[,\]}\s]')
+
+
+def _require(module, name):
+
+    if module is None:
+        raise RuntimeError(f"The '{name}' package is required for this portfolio format.")
+
+
+def format_from_path(path):
+    """
+    Guess the snapshot format from a file name.
+    """
+
+    name = str(path).lower()
+
+    for format_name in ("json.gz", "json.zst", "msgpack"):
+        if name.endswith(SUFFIXES[format_name]):
+            return format_name
+
+    return "json"
+
+
+def write_portfolio(portfolio, path, format=None, compress_level=6):
+    """
+    Stream `portfolio` to `path` in the given format (guessed from
+    the file name when omitted) and atomically replace the file.
+    """
+
+    path = Path(path)
+
+    format = format or format_from_path(path)
+
+    if format not in FORMATS:
+        raise ValueError(f"Unknown portfolio format: {format}")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with atomic_open(path, "wb") as raw:
+
+        if format == "msgpack":
+            _require(msgpack, "msgpack")
+            msgpack.pack(portfolio, raw, default=str, datetime=False)
+            return path
+
+        if format == "json.gz":
+            stream = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=compress_level, mtime=0)
+        elif format == "json.zst":
+            _require(zstandard, "zstandard")
+            stream = zstandard.ZstdCompressor(level=compress_level).stream_writer(raw, closefd=False)
+        else:
+            stream = None
+
+        target = stream or raw
+
+        encoder = json.JSONEncoder(separators=(",", ":"), default=str)
+
+        writer = io.BufferedWriter(_RawWriter(target), buffer_size=64 * 1024)
+
+        for chunk in encoder.iterencode(portfolio):
+            writer.write(chunk.encode("utf-8"))
+
+        writer.flush()
+
+        if stream is not None:
+            stream.close()
+
+    return path
+
+
+class _RawWriter(io.RawIOBase):
+    """
+    Adapts any object with write() so it can sit under a BufferedWriter.
+    """
+
+    def __init__(self, target):
+
+        self.target = target
+
+    def writable(self):
+
+        return True
+
+    def write(self, data):
+
+        self.target.write(data)
+
+        return len(data)
+
+
+def detect_format(path):
+    """
+    Snapshot format of an existing file, from its leading bytes.
+    """
+
+    with open(path, "rb") as file:
+        head = file.read(4)
+
+    if head.startswith(GZIP_MAGIC):
+        return "json.gz"
+
+    if head.startswith(ZSTD_MAGIC):
+        return "json.zst"
+
+    if head.lstrip()[:1] in (b"{", b"["):
+        return "json"
+
+    return "msgpack"
+
+
+def open_portfolio_text(path, format=None):
+    """
+    Open a JSON snapshot (plain or compressed) as a text stream.
+    """
+
+    format = format or detect_format(path)
+
+    if format == "json.gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+
+    if format == "json.zst":
+        _require(zstandard, "zstandard")
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+
+    if format == "json":
+        return open(path, "r", encoding="utf-8")
+
+    raise ValueError(f"{path} is not a JSON portfolio snapshot.")
+
+
+def load_portfolio(path):
+    """
+    Load a snapshot written in any supported format.
+    """
+
+    format = detect_format(path)
+
+    if format == "msgpack":
+        _require(msgpack, "msgpack")
+        with open(path, "rb") as file:
+            return msgpack.unpack(file, raw=False, strict_map_key=False)
+
+    with open_portfolio_text(path, format) as file:
+        return json.load(file)
+
+
+class _JsonStream:
+    """
+    Minimal pull parser over a JSON text stream. Values that are
+    skipped are scanned without being built, and consumed input is
+    dropped, so memory stays flat however large the document is.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, stream):
+
+        self.stream = stream
+
+        self.buffer = ""
+
+        self.pos = 0
+
+        self.eof = False
+
+        # Start of a value being read, and the parts of it already
+        # scanned that _fill moved out of the buffer.
+        self.mark = None
+
+        self.held = []
+
+        self.decoder = json.JSONDecoder()
+
+    # ---------------------------------------------------
+
+    def _fill(self):
+
+        if self.eof:
+            return False
+
+        chunk = self.stream.read(self.CHUNK_SIZE)
+
+        if not chunk:
+            self.eof = True
+            return False
+
+        if self.mark is not None:
+            # Park the scanned part of the value, so every character is
+            # copied a bounded number of times however long it is.
+            self.held.append(self.buffer[self.mark:self.pos])
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+            self.mark = 0
+
+        elif self.pos > self.CHUNK_SIZE:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+
+        self.buffer += chunk
+
+        return True
+
+    # ---------------------------------------------------
+
+    def peek(self):
+        """
+        Next non-whitespace character (not consumed), or "" at the end.
+        """
+
+        while True:
+
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if not self._fill():
+                return ""
+
+    # ---------------------------------------------------
+
+    def expect(self, char):
+
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the portfolio JSON.")
+
+        self.pos += 1
+
+    # ---------------------------------------------------
+
+    def read_value(self):
+
+        self.peek()
+
+        # Find the end with the linear scanner first, then decode the
+        # value once, instead of re-decoding a growing buffer per chunk.
+        self.mark = self.pos
+
+        try:
+            self.skip_value()
+            text = "".join(self.held) + self.buffer[self.mark:self.pos]
+        finally:
+            self.mark = None
+            self.held = []
+
+        return self.decoder.raw_decode(text)[0]
+
+    # ---------------------------------------------------
+
+    def skip_value(self):
+
+        first = self.peek()
+
+        if first not in ('"', "[", "{"):
+            # Scalar: ends at the next delimiter.
+            while True:
+                match = _SCALAR_END.search(self.buffer, self.pos)
+                if match:
+                    self.pos = match.start()
+                    return
+                self.pos = len(self.buffer)
+                if not self._fill():
+                    return
+
+        depth = 0
+
+        while True:
+
+            for match in _TOKEN.finditer(self.buffer, self.pos):
+
+                token = match.group()
+
+                if token[0] == '"':
+                    if match.group(1) is None:
+                        # String continues in the next chunk.
+                        self.pos = match.start()
+                        break
+                    if depth == 0:
+                        self.pos = match.end()
+                        return
+                    continue
+
+                depth += 1 if token in "[{" else -1
+
+                if depth == 0:
+                    self.pos = match.end()
+                    return
+
+            else:
+                self.pos = len(self.buffer)
+
+            if not self._fill():
+                return
+
+    # ---------------------------------------------------
+
+    def iter_array(self):
+
+        self.expect("[")
+
+        if self.peek() == "]":
+            self.pos += 1
+            return
+
+        while True:
+
+            yield self.read_value()
+
+            separator = self.peek()
+
+            self.pos += 1
+
+            if separator == "]":
+                return
+
+            if separator != ",":
+                raise ValueError(f"Expected ',' or ']' at offset {self.pos} of the portfolio JSON.")
+
+    # ---------------------------------------------------
+
+    def iter_object_keys(self):
+        """
+        Yield each key of an object; the caller must consume
+        (read_value / skip_value / iter_array) its value in between.
+        """
+
+        self.expect("{")
+
+        if self.peek() == "}":
+            self.pos += 1
+            return
+
+        while True:
+
+            key = self.read_value()
+
+            self.expect(":")
+
+            yield key
+
+            separator = self.peek()
+
+            self.pos += 1
+
+            if separator == "}":
+                return
+
+            if separator != ",":
+                raise ValueError(f"Expected ',' or '}}' at offset {self.pos} of the portfolio JSON.")
+
+
+def load_sections(path, sections):
+    """
+    Read only the requested top-level sections of a snapshot,
+    skipping everything else without parsing it. Stops reading as
+    soon as all of them were found.
+    """
+
+    wanted = set(sections)
+
+    if detect_format(path) == "msgpack":
+        data = load_portfolio(path)
+        return {name: data[name] for name in sections if name in data}
+
+    result = {}
+
+    with open_portfolio_text(path) as file:
+
+        stream = _JsonStream(file)
+
+        for key in stream.iter_object_keys():
+
+            if key in wanted:
+                result[key] = stream.read_value()
+                if len(result) == len(wanted):
+                    break
+            else:
+                stream.skip_value()
+
+    return result
+
+
+def iter_section_items(path, section):
+    """
+    Yield the records of a list section (e.g. "holdings") one at a
+    time while the file is still being read.
+    """
+
+    if detect_format(path) == "msgpack":
+        yield from load_portfolio(path).get(section) or []
+        return
+
+    with open_portfolio_text(path) as file:
+
+        stream = _JsonStream(file)
+
+        for key in stream.iter_object_keys():
+
+            if key != section:
+                stream.skip_value()
+                continue
+
+            if stream.peek() != "[":
+                return
+
+            yield from stream.iter_array()
+
+            return
+
+
+def iter_first_section_items(path, sections):
+    """
+    Yield the records of the first of `sections` that has any, in a
+    single pass over the file. Records of a later choice that comes
+    first in the file are held until the earlier ones turn out to be
+    empty.
+    """
+
+    if detect_format(path) == "msgpack":
+        data = load_portfolio(path)
+        for section in sections:
+            if data.get(section):
+                yield from data[section]
+                return
+        return
+
+    pending = list(sections)
+
+    held = {}
+
+    with open_portfolio_text(path) as file:
+
+        stream = _JsonStream(file)
+
+        for key in stream.iter_object_keys():
+
+            if key not in pending or key in held:
+                stream.skip_value()
+                continue
+
+            if stream.peek() != "[":
+                stream.skip_value()
+                held[key] = []
+
+            elif key == pending[0]:
+
+                found = False
+
+                for item in stream.iter_array():
+                    found = True
+                    yield item
+
+                if found:
+                    return
+
+                held[key] = []
+
+            else:
+                held[key] = list(stream.iter_array())
+
+            while pending and pending[0] in held:
+
+                records = held.pop(pending.pop(0))
+
+                if records:
+                    yield from records
+                    return
+
+    # Sections missing from the file count as empty.
+    for section in pending:
+        if held.get(section):
+            yield from held[section]
+            return
@@ -1,17 +1,55 @@
 import argparse
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
+from requests.adapters import HTTPAdapter
+
+
+CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}?interval=1d&range=1mo"
+
+HISTORY_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}?interval={interval}&period1={start}&period2={end}"
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+DEFAULT_WORKERS = 8
+
+_session = None
+
+_session_lock = threading.Lock()
+
+
+def create_session(pool_size=DEFAULT_WORKERS):
+    # Keep-alive session whose connection pool fits `pool_size` parallel requests
+    session = requests.Session()
+    session.headers.update(HEADERS)
 
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
 
-def get_quote(symbol: str):
+    return session
+
+
+def get_session():
+    # Shared session, so repeated calls reuse open connections
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def get_quote(symbol: str, session=None):
     symbol = symbol.strip().upper()
-    url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}?interval=1d&range=1mo"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    response = requests.get(url, headers=headers, timeout=20)
+    url = CHART_URL.format(symbol=symbol)
+    response = (session or get_session()).get(url, timeout=20)
     response.raise_for_status()
 
     payload = response.json()
-    result = payload.get("chart", {}).get("result", [{}])[0]
+    result = (payload.get("chart", {}).get("result") or [{}])[0]
     meta = result.get("meta", {})
 
     return {
@@ -26,16 +64,107 @@ def get_quote(symbol: str):
     }
 
 
+def get_history(symbol: str, start: int, end: int, interval="1d", session=None):
+    # OHLCV candles between two epoch timestamps as
+    # [(timestamp, open, high, low, close, volume)], skipping empty bars
+    symbol = symbol.strip().upper()
+    url = HISTORY_URL.format(symbol=symbol, interval=interval, start=int(start), end=int(end))
+    response = (session or get_session()).get(url, timeout=20)
+    response.raise_for_status()
+
+    result = (response.json().get("chart", {}).get("result") or [{}])[0]
+    timestamps = result.get("timestamp") or []
+    quote = (result.get("indicators", {}).get("quote") or [{}])[0]
+
+    empty = [None] * len(timestamps)
+    columns = [quote.get(name) or empty for name in ("open", "high", "low", "close", "volume")]
+
+    candles = []
+    for timestamp, open_, high, low, close, volume in zip(timestamps, *columns):
+        if None in (open_, high, low, close):
+            continue
+        candles.append((int(timestamp), open_, high, low, close, int(volume or 0)))
+
+    return candles
+
+
+def _unique_symbols(symbols):
+    seen = {}
+    for symbol in symbols:
+        symbol = symbol.strip().upper()
+        if symbol:
+            seen.setdefault(symbol, None)
+    return list(seen)
+
+
+def iter_quotes(symbols, workers=DEFAULT_WORKERS, session=None):
+    # Yield one result per symbol as soon as it arrives. Failures are
+    # yielded as {"symbol": ..., "error": ...} instead of raised.
+    symbols = _unique_symbols(symbols)
+
+    if not symbols:
+        return
+
+    workers = max(1, min(workers, len(symbols)))
+    session = session or (get_session() if workers <= DEFAULT_WORKERS else create_session(workers))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(get_quote, symbol, session): symbol
+            for symbol in symbols
+        }
+
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                yield future.result()
+            except Exception as exc:
+                yield {"symbol": symbol, "error": f"{type(exc).__name__}: {exc}"}
+
+
+def get_quotes(symbols, workers=DEFAULT_WORKERS, session=None):
+    # {symbol: quote or {"symbol", "error"}} for every requested symbol
+    return {
+        result["symbol"]: result
+        for result in iter_quotes(symbols, workers=workers, session=session)
+    }
+
+
+def read_symbols_file(path):
+    # One or more comma/space separated symbols per line; "#" starts a comment
+    symbols = []
+    with open(path, "r", encoding="utf-8") as symbols_file:
+        for line in symbols_file:
+            line = line.split("#", 1)[0]
+            symbols.extend(line.replace(",", " ").split())
+    return symbols
+
+
 def main():
     parser = argparse.ArgumentParser(description="Fetch public market data without login")
     parser.add_argument("--symbol", default="AAPL", help="Stock symbol to query")
+    parser.add_argument("--symbols", nargs="+", help="Several symbols (space or comma separated), fetched concurrently")
+    parser.add_argument("--symbols-file", help="File with symbols to fetch concurrently")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Maximum parallel requests in batch mode")
     args = parser.parse_args()
 
-    try:
-        quote = get_quote(args.symbol)
-        print(json.dumps(quote, indent=2))
-    except Exception as exc:
-        print(f"Error: {exc}")
+    symbols = []
+    for value in args.symbols or []:
+        symbols.extend(value.split(","))
+    if args.symbols_file:
+        symbols.extend(read_symbols_file(args.symbols_file))
+
+    if not symbols:
+        try:
+            quote = get_quote(args.symbol)
+            print(json.dumps(quote, indent=2))
+        except Exception as exc:
+            print(f"Error: {exc}")
+        return
+
+    # Batch mode: one JSON line per symbol, in arrival order
+    for result in iter_quotes(symbols, workers=args.workers):
+        print(json.dumps(result), flush=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,239 @@
+"""
+quote_cache.py
+
+In-process cache for LTP and quote lookups.
+
+Entries are kept per (call type, symbol) with a TTL per call type and
+LRU eviction once the cache is full. Expired entries are still served
+for a short stale window while a single background refresh per symbol
+updates them, and concurrent misses for the same symbol share one
+upstream request.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config import Config
+
+
+class QuoteCache:
+
+    def __init__(self, ttls=None, max_size=5000, stale_ttl=30.0, refresh_workers=2):
+
+        # Seconds a value stays fresh, per call type ("ltp", "quote").
+        self.ttls = dict(ttls or {"ltp": 1.0, "quote": 2.0})
+
+        self.max_size = max_size
+
+        # Seconds past the TTL during which a stale value is still served.
+        self.stale_ttl = stale_ttl
+
+        self.entries = OrderedDict()
+
+        self.inflight = {}
+
+        self.lock = threading.Lock()
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=refresh_workers,
+            thread_name_prefix="quote-cache"
+        )
+
+        self.counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "collapsed": 0,
+            "refreshes": 0,
+            "evictions": 0,
+        }
+
+    # ---------------------------------------------------
+
+    def get_many(self, kind, symbols, fetch):
+        """
+        Return {symbol: value} for `symbols`, calling `fetch(missing)`
+        only for symbols that are neither cached nor already in flight.
+        `fetch` must return a dict keyed like the Kite ltp/quote replies.
+        """
+
+        ttl = self.ttls.get(kind, 1.0)
+
+        now = time.monotonic()
+
+        result = {}
+
+        missing = []
+
+        stale = []
+
+        waiting = {}
+
+        with self.lock:
+
+            for symbol in symbols:
+
+                key = (kind, symbol)
+
+                entry = self.entries.get(key)
+
+                if entry is not None:
+
+                    value, fetched_at = entry
+
+                    age = now - fetched_at
+
+                    if age <= ttl + self.stale_ttl:
+
+                        self.entries.move_to_end(key)
+
+                        result[symbol] = value
+
+                        if age <= ttl:
+                            self.counters["hits"] += 1
+                            continue
+
+                        self.counters["stale_hits"] += 1
+
+                        if key not in self.inflight:
+                            self.inflight[key] = Future()
+                            stale.append(symbol)
+
+                        continue
+
+                if key in self.inflight:
+                    self.counters["collapsed"] += 1
+                    waiting[symbol] = self.inflight[key]
+                    continue
+
+                self.counters["misses"] += 1
+
+                self.inflight[key] = Future()
+
+                missing.append(symbol)
+
+            if stale:
+                self.counters["refreshes"] += 1
+
+        if stale:
+            self.executor.submit(self._load, kind, stale, fetch, True)
+
+        if missing:
+            result.update(self._load(kind, missing, fetch))
+
+        for symbol, future in waiting.items():
+
+            value = future.result()
+
+            if value is not None:
+                result[symbol] = value
+
+        return result
+
+    # ---------------------------------------------------
+
+    def _load(self, kind, symbols, fetch, background=False):
+
+        try:
+            data = fetch(symbols)
+
+        except Exception as exc:
+
+            with self.lock:
+                futures = [self.inflight.pop((kind, symbol), None) for symbol in symbols]
+
+            for future in futures:
+                if future is not None:
+                    future.set_exception(exc)
+
+            if background:
+                return {}
+
+            raise
+
+        now = time.monotonic()
+
+        loaded = {}
+
+        with self.lock:
+
+            for symbol in symbols:
+
+                key = (kind, symbol)
+
+                # Kite keys replies by the instrument string it was given.
+                value = data.get(symbol, data.get(str(symbol)))
+
+                if value is not None:
+                    loaded[symbol] = value
+                    self.entries[key] = (value, now)
+                    self.entries.move_to_end(key)
+
+                future = self.inflight.pop(key, None)
+
+                if future is not None:
+                    future.set_result(value)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+        return loaded
+
+    # ---------------------------------------------------
+
+    def invalidate(self, kind=None, symbol=None):
+
+        with self.lock:
+
+            if kind is None and symbol is None:
+                self.entries.clear()
+                return
+
+            for key in list(self.entries):
+                if (kind is None or key[0] == kind) and (symbol is None or key[1] == symbol):
+                    del self.entries[key]
+
+    # ---------------------------------------------------
+
+    def stats(self):
+
+        with self.lock:
+
+            snapshot = dict(self.counters)
+
+            snapshot["size"] = len(self.entries)
+
+            snapshot["inflight"] = len(self.inflight)
+
+        return snapshot
+
+
+_cache = None
+
+_cache_lock = threading.Lock()
+
+
+def get_quote_cache():
+    """
+    The quote cache shared by every ZerodhaClient in this process,
+    configured from .env (see Config).
+    """
+
+    global _cache
+
+    with _cache_lock:
+
+        if _cache is None:
+            _cache = QuoteCache(
+                ttls={
+                    "ltp": Config.LTP_CACHE_TTL,
+                    "quote": Config.QUOTE_CACHE_TTL,
+                },
+                max_size=Config.QUOTE_CACHE_SIZE,
+                stale_ttl=Config.QUOTE_CACHE_STALE_TTL
+            )
+
+        return _cache
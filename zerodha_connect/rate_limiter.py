@@ -0,0 +1,323 @@
+"""
+rate_limiter.py
+
+Process-wide rate-limit scheduler for Kite Connect calls.
+
+Each endpoint class gets its own token bucket matching the Kite
+per-second limits. Waiting callers are served by priority lane first
+and arrival order second, so interactive lookups jump ahead of bulk
+background refreshes.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+
+# Requests per second allowed by Kite for each endpoint class.
+RATE_LIMITS = {
+    "quote": 1,
+    "historical": 3,
+    "order": 10,
+    "default": 10,
+}
+
+# Priority lanes, lower runs first.
+PRIORITY_INTERACTIVE = 0
+
+PRIORITY_BULK = 1
+
+LANE_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BULK: "bulk",
+}
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens are added per second,
+    up to `capacity`. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity=None):
+
+        self.rate = float(rate)
+
+        self.capacity = float(capacity if capacity is not None else rate)
+
+        self.tokens = self.capacity
+
+        self.updated = time.monotonic()
+
+        self.lock = threading.Lock()
+
+    # ---------------------------------------------------
+
+    def _refill(self, now):
+
+        elapsed = now - self.updated
+
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+
+        self.updated = now
+
+    # ---------------------------------------------------
+
+    def try_acquire(self):
+        """
+        Take a token if one is available. Returns 0 on success,
+        otherwise the number of seconds until the next token.
+        """
+
+        with self.lock:
+
+            self._refill(time.monotonic())
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+
+            return (1 - self.tokens) / self.rate
+
+    # ---------------------------------------------------
+
+    def acquire(self):
+
+        while True:
+
+            delay = self.try_acquire()
+
+            if not delay:
+                return
+
+            time.sleep(delay)
+
+
+class RateLimitScheduler:
+    """
+    Hands out tokens from per-endpoint-class buckets to waiting
+    callers in (priority, arrival) order and keeps queue statistics.
+    """
+
+    def __init__(self, limits=None):
+
+        self.limits = dict(limits or RATE_LIMITS)
+
+        self.buckets = {}
+
+        self.queues = {}
+
+        self.conditions = {}
+
+        self.stats_by_class = {}
+
+        self.sequence = itertools.count()
+
+        self.lock = threading.Lock()
+
+    # ---------------------------------------------------
+
+    def _endpoint(self, endpoint_class):
+
+        with self.lock:
+
+            if endpoint_class not in self.buckets:
+
+                rate = self.limits.get(endpoint_class, self.limits["default"])
+
+                self.buckets[endpoint_class] = TokenBucket(rate)
+
+                self.queues[endpoint_class] = []
+
+                self.conditions[endpoint_class] = threading.Condition()
+
+                self.stats_by_class[endpoint_class] = {
+                    "requests": 0,
+                    "total_wait": 0.0,
+                    "max_wait": 0.0,
+                    "max_queue_depth": 0,
+                }
+
+            return (
+                self.buckets[endpoint_class],
+                self.queues[endpoint_class],
+                self.conditions[endpoint_class],
+                self.stats_by_class[endpoint_class],
+            )
+
+    # ---------------------------------------------------
+
+    def acquire(self, endpoint_class, priority=PRIORITY_INTERACTIVE):
+        """
+        Block until the caller may send one request of `endpoint_class`.
+        Returns the number of seconds spent waiting.
+        """
+
+        bucket, queue, condition, stats = self._endpoint(endpoint_class)
+
+        ticket = (priority, next(self.sequence))
+
+        started = time.monotonic()
+
+        with condition:
+
+            heapq.heappush(queue, ticket)
+
+            stats["max_queue_depth"] = max(stats["max_queue_depth"], len(queue))
+
+            while True:
+
+                if queue[0] == ticket:
+
+                    delay = bucket.try_acquire()
+
+                    if not delay:
+                        heapq.heappop(queue)
+                        condition.notify_all()
+                        break
+
+                    condition.wait(delay)
+
+                else:
+                    condition.wait()
+
+            waited = self._record(stats, started)
+
+        return waited
+
+    # ---------------------------------------------------
+
+    async def acquire_async(self, endpoint_class, priority=PRIORITY_INTERACTIVE):
+        """
+        acquire() for coroutines: waits in the same queue, but with
+        asyncio.sleep instead of holding a thread. Returns the number
+        of seconds spent waiting.
+        """
+
+        bucket, queue, condition, stats = self._endpoint(endpoint_class)
+
+        ticket = (priority, next(self.sequence))
+
+        started = time.monotonic()
+
+        with condition:
+
+            heapq.heappush(queue, ticket)
+
+            stats["max_queue_depth"] = max(stats["max_queue_depth"], len(queue))
+
+        try:
+
+            while True:
+
+                with condition:
+
+                    if queue[0] == ticket:
+
+                        delay = bucket.try_acquire()
+
+                        if not delay:
+                            heapq.heappop(queue)
+                            condition.notify_all()
+                            return self._record(stats, started)
+
+                    else:
+                        # Not woken by notify_all; look again about when
+                        # the caller ahead can have taken its token.
+                        delay = 1 / bucket.rate
+
+                await asyncio.sleep(delay)
+
+        except BaseException:
+
+            # Cancelled while queued: give the place up.
+            with condition:
+
+                if ticket in queue:
+                    queue.remove(ticket)
+                    heapq.heapify(queue)
+                    condition.notify_all()
+
+            raise
+
+    # ---------------------------------------------------
+
+    @staticmethod
+    def _record(stats, started):
+
+        waited = time.monotonic() - started
+
+        stats["requests"] += 1
+
+        stats["total_wait"] += waited
+
+        stats["max_wait"] = max(stats["max_wait"], waited)
+
+        return waited
+
+    # ---------------------------------------------------
+
+    def call(self, endpoint_class, fn, *args, priority=PRIORITY_INTERACTIVE, **kwargs):
+
+        self.acquire(endpoint_class, priority)
+
+        return fn(*args, **kwargs)
+
+    # ---------------------------------------------------
+
+    def stats(self):
+        """
+        Snapshot of queue depth per lane and wait-time statistics
+        for every endpoint class seen so far.
+        """
+
+        snapshot = {}
+
+        with self.lock:
+            endpoint_classes = list(self.buckets)
+
+        for endpoint_class in endpoint_classes:
+
+            _, queue, condition, stats = self._endpoint(endpoint_class)
+
+            with condition:
+
+                depth = {name: 0 for name in LANE_NAMES.values()}
+
+                for priority, _ in queue:
+                    lane = LANE_NAMES.get(priority, str(priority))
+                    depth[lane] = depth.get(lane, 0) + 1
+
+                requests = stats["requests"]
+
+                snapshot[endpoint_class] = {
+                    "queue_depth": depth,
+                    "requests": requests,
+                    "avg_wait": stats["total_wait"] / requests if requests else 0.0,
+                    "max_wait": stats["max_wait"],
+                    "max_queue_depth": stats["max_queue_depth"],
+                }
+
+        return snapshot
+
+
+_scheduler = None
+
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    The scheduler shared by every ZerodhaClient in this process.
+    """
+
+    global _scheduler
+
+    with _scheduler_lock:
+
+        if _scheduler is None:
+            _scheduler = RateLimitScheduler()
+
+        return _scheduler
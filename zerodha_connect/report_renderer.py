@@ -0,0 +1,243 @@
+"""
+report_renderer.py
+
+Shared HTML table renderer for notification emails. Stock_Pulse keeps
+a copy next to Dividend_Stocks.py; change both together.
+
+Styling lives in one small <style> block keyed by CSS classes instead
+of being repeated on every cell. Each table shape (its columns and which
+of them are numeric) is compiled once into a row format string, and the
+rows are rendered into a list that is joined at the end, so rendering
+time grows linearly with the number of rows. Sorting, paging, top-N and
+number formatting are applied before anything is rendered.
+"""
+
+import heapq
+import html
+from functools import lru_cache
+
+
+STYLE = (
+    "<style>"
+    ".rt{border-collapse:collapse;width:100%;font-family:Arial,sans-serif;color:#333}"
+    ".rt th{background:#1f77b4;color:#fff;text-align:left}"
+    ".rt th,.rt td{padding:6px 10px;border:1px solid #c8c8c8;vertical-align:top}"
+    ".rt .o{background:#f8f9fb}"
+    ".rt .n{text-align:right}"
+    ".rt caption{text-align:left;font-weight:bold;padding:6px 0}"
+    ".rt-info{font-family:Arial,sans-serif;color:#666;font-size:12px}"
+    "</style>"
+)
+
+EMPTY_MESSAGE = "<p>No data available to generate table.</p>"
+
+# Default format spec per numeric type.
+NUMBER_FORMATS = {
+    int: "{:,}",
+    float: "{:,.2f}",
+}
+
+
+def _is_number(value):
+
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+@lru_cache(maxsize=64)
+def compile_row_template(numeric):
+    """
+    Row format strings (even, odd) for a table whose columns are
+    numeric or not, e.g. numeric=(False, True, True).
+    """
+
+    cells = "".join('<td class="n">{}</td>' if flag else "<td>{}</td>" for flag in numeric)
+
+    return f"<tr>{cells}</tr>", f'<tr class="o">{cells}</tr>'
+
+
+def _normalize(data, columns):
+    """
+    (keys, labels, rows) for a list of dicts or of sequences.
+    `columns` may list keys or (key, label) pairs.
+    """
+
+    first_row = data[0]
+
+    if columns is None:
+        if isinstance(first_row, dict):
+            columns = list(first_row.keys())
+        else:
+            width = len(first_row) if isinstance(first_row, (list, tuple)) else 1
+            columns = [(index, f"Column {index + 1}") for index in range(width)]
+
+    keys = []
+
+    labels = []
+
+    for column in columns:
+        if isinstance(column, tuple):
+            key, label = column
+        else:
+            key, label = column, column
+        keys.append(key)
+        labels.append(str(label))
+
+    if isinstance(first_row, dict):
+        rows = [
+            [item.get(key, "") for key in keys] if isinstance(item, dict) else [""] * len(keys)
+            for item in data
+        ]
+
+    else:
+        # Sequence rows: keys are positions, or labels for the given columns.
+        positions = [
+            key if isinstance(key, int) else index
+            for index, key in enumerate(keys)
+        ]
+        rows = []
+        for item in data:
+            item = item if isinstance(item, (list, tuple)) else (item,)
+            rows.append([item[position] if position < len(item) else "" for position in positions])
+
+    return keys, labels, rows
+
+
+def _sort_rows(rows, index, descending=False, top=None):
+
+    # Numbers before text in the requested direction, missing values
+    # last (in their original order) either way.
+    numbers, texts, missing = [], [], []
+
+    for row in rows:
+        value = row[index]
+        if value is None or value == "":
+            missing.append(row)
+        elif _is_number(value):
+            numbers.append(row)
+        else:
+            texts.append(row)
+
+    ordered = []
+
+    for group, key in ((numbers, lambda row: row[index]), (texts, lambda row: str(row[index]))):
+
+        limit = None if top is None else top - len(ordered)
+
+        if limit is not None and limit < len(group):
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            ordered += pick(max(limit, 0), group, key=key)
+        else:
+            ordered += sorted(group, key=key, reverse=descending)
+
+    return ordered + missing
+
+
+def _formatter(spec):
+
+    if callable(spec):
+        return spec
+
+    return spec.format
+
+
+def render_table(
+    data,
+    columns=None,
+    sort_by=None,
+    descending=False,
+    top=None,
+    page=None,
+    page_size=None,
+    formats=None,
+    caption=None,
+    include_style=True,
+):
+    """
+    Render `data` (dicts or sequences) as an HTML table.
+
+    sort_by     column key (or label) to order rows by
+    top         keep only the first N rows after sorting
+    page        1-based page number, with page_size rows per page
+    formats     {column key: format spec like "{:,.1f}" or a callable};
+                other numbers use NUMBER_FORMATS
+    caption     optional table caption
+    """
+
+    if not isinstance(data, list) or not data:
+        return EMPTY_MESSAGE
+
+    keys, labels, rows = _normalize(data, columns)
+
+    total = len(rows)
+
+    if sort_by is not None:
+
+        index = keys.index(sort_by) if sort_by in keys else labels.index(str(sort_by))
+
+        rows = _sort_rows(rows, index, descending, top)
+
+    if top is not None:
+        rows = rows[:top]
+
+    if page_size:
+        start = (max(page or 1, 1) - 1) * page_size
+        rows = rows[start:start + page_size]
+
+    numeric = tuple(
+        any(_is_number(row[index]) for row in rows[:50])
+        and all(_is_number(row[index]) or row[index] in (None, "") for row in rows)
+        for index in range(len(keys))
+    )
+
+    formats = formats or {}
+
+    cell_formatters = [
+        _formatter(formats[key]) if key in formats else None
+        for key in keys
+    ]
+
+    escape = html.escape
+
+    def cell(index, value):
+
+        if value is None or value == "":
+            return ""
+
+        formatter = cell_formatters[index]
+
+        if formatter is not None:
+            return escape(str(formatter(value)))
+
+        if numeric[index] and _is_number(value):
+            return NUMBER_FORMATS[float if isinstance(value, float) else int].format(value)
+
+        return escape(str(value))
+
+    even, odd = compile_row_template(numeric)
+
+    width = range(len(keys))
+
+    parts = [STYLE] if include_style else []
+
+    parts.append('<table class="rt">')
+
+    if caption:
+        parts.append(f"<caption>{escape(str(caption))}</caption>")
+
+    parts.append("<thead><tr>")
+
+    parts.extend(f"<th>{escape(label)}</th>" for label in labels)
+
+    parts.append("</tr></thead><tbody>")
+
+    parts.extend(
+        (odd if position % 2 else even).format(*[cell(index, row[index]) for index in width])
+        for position, row in enumerate(rows)
+    )
+
+    parts.append("</tbody></table>")
+
+    if len(rows) < total:
+        parts.append(f'<p class="rt-info">Showing {len(rows):,} of {total:,} rows.</p>')
+
+    return "".join(parts)
@@ -0,0 +1,196 @@
+"""
+resilience.py
+
+Failure handling shared by ZerodhaClient calls.
+
+- is_transient() tells upstream trouble (timeouts, connection errors,
+  429 / 5xx replies) apart from errors a retry cannot fix.
+- backoff_delay() is "full jitter" exponential backoff, so clients that
+  failed together do not retry in lockstep.
+- CircuitBreaker fails calls fast once an endpoint class keeps failing,
+  and lets a single trial call through after a cool-down to see if the
+  upstream has recovered.
+"""
+
+import random
+import threading
+import time
+
+import requests
+from kiteconnect.exceptions import KiteException, NetworkException
+
+
+CLOSED = "closed"
+
+OPEN = "open"
+
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    The deadline passed before the request left this process (it was
+    still queued on the rate limiter), so the upstream is not to blame.
+    """
+
+
+def is_transient(exc):
+
+    if isinstance(exc, DeadlineExceeded):
+        return False
+
+    if isinstance(exc, (NetworkException, TimeoutError, ConnectionError,
+                        requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+
+    return isinstance(exc, KiteException) and (exc.code or 0) >= 500
+
+
+def backoff_delay(attempt, base, cap):
+    """
+    Seconds to sleep before retry number `attempt` (1, 2, ...).
+    """
+
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=10.0):
+
+        self.name = name
+
+        self.failure_threshold = failure_threshold
+
+        # Seconds an open circuit waits before letting a trial call through.
+        self.reset_timeout = reset_timeout
+
+        self.state = CLOSED
+
+        self.failures = 0
+
+        self.opened_at = 0.0
+
+        self.rejected = 0
+
+        self.lock = threading.Lock()
+
+    # ---------------------------------------------------
+
+    def before_call(self):
+        """
+        Raise CircuitOpenError unless a call may go upstream now.
+        """
+
+        with self.lock:
+
+            if self.state == CLOSED:
+                return
+
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                return
+
+            self.rejected += 1
+
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+        raise CircuitOpenError(
+            f"Circuit for '{self.name}' calls is open after {self.failures} failures; "
+            f"retry in {retry_in:.1f}s."
+        )
+
+    # ---------------------------------------------------
+
+    def record_success(self):
+
+        with self.lock:
+
+            self.state = CLOSED
+
+            self.failures = 0
+
+    # ---------------------------------------------------
+
+    def record_failure(self):
+
+        with self.lock:
+
+            self.failures += 1
+
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    # ---------------------------------------------------
+
+    def release(self):
+        """
+        A call let through by before_call() ended without reaching the
+        upstream; if it was the half-open trial, let the next call try.
+        """
+
+        with self.lock:
+
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+                self.opened_at = time.monotonic() - self.reset_timeout
+
+    # ---------------------------------------------------
+
+    def stats(self):
+
+        with self.lock:
+
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "rejected": self.rejected,
+            }
+
+
+def breaker_samples(stats):
+    """
+    Prometheus samples of {name: CircuitBreaker.stats()}.
+    """
+
+    for name, breaker_stats in stats.items():
+
+        labels = {"endpoint_class": name}
+
+        yield "open", labels, int(breaker_stats["state"] != CLOSED)
+
+        yield "failures", labels, breaker_stats["failures"]
+
+        yield "rejected", labels, breaker_stats["rejected"]
+
+
+_breakers = {}
+
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name, failure_threshold=5, reset_timeout=10.0):
+    """
+    The breaker shared by every client in this process for one
+    endpoint class.
+    """
+
+    with _breakers_lock:
+
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, failure_threshold, reset_timeout)
+
+        return _breakers[name]
+
+
+def breaker_stats():
+
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+
+    return {breaker.name: breaker.stats() for breaker in breakers}
@@ -0,0 +1,239 @@
+"""
+smtp_stub.py
+
+Local SMTP stand-in for testing the mail dispatcher end to end.
+
+Speaks just enough SMTP for smtplib (EHLO/HELO, AUTH PLAIN/LOGIN, MAIL,
+RCPT, DATA, NOOP, RSET, QUIT), keeps every delivered message in memory
+and counts connections and logins, so tests can check that sessions are
+reused. drop_connections() closes live sessions to simulate a server
+timing out idle clients.
+"""
+
+import email
+import socketserver
+import threading
+import time
+from email import policy
+
+
+class SmtpStubHandler(socketserver.StreamRequestHandler):
+
+    def setup(self):
+
+        super().setup()
+
+        self.server.stub._register(self.connection)
+
+    def finish(self):
+
+        self.server.stub._unregister(self.connection)
+
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def reply(self, line):
+
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+        self.wfile.flush()
+
+    def handle(self):
+
+        stub = self.server.stub
+
+        self.reply("220 smtp-stub ESMTP ready")
+
+        mail_from = None
+
+        recipients = []
+
+        while True:
+
+            try:
+                raw = self.rfile.readline()
+            except OSError:
+                return
+
+            if not raw:
+                return
+
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+
+            command = line[:4].upper()
+
+            if command in ("EHLO", "HELO"):
+
+                if command == "EHLO":
+                    self.reply("250-smtp-stub")
+                    self.reply("250-8BITMIME")
+                    self.reply("250 AUTH PLAIN LOGIN")
+                else:
+                    self.reply("250 smtp-stub")
+
+            elif command == "AUTH":
+
+                if line.upper().startswith("AUTH LOGIN"):
+                    # Username and password lines; any credentials pass.
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+
+                with stub.lock:
+                    stub.logins += 1
+
+                self.reply("235 2.7.0 Authentication successful")
+
+            elif command == "MAIL":
+
+                mail_from = line.split(":", 1)[1].strip().strip("<>")
+
+                recipients = []
+
+                self.reply("250 OK")
+
+            elif command == "RCPT":
+
+                recipients.append(line.split(":", 1)[1].strip().strip("<>"))
+
+                self.reply("250 OK")
+
+            elif command == "DATA":
+
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+
+                lines = []
+
+                while True:
+
+                    raw = self.rfile.readline()
+
+                    if not raw or raw in (b".\r\n", b".\n"):
+                        break
+
+                    # Undo dot-stuffing.
+                    lines.append(raw[1:] if raw.startswith(b"..") else raw)
+
+                time.sleep(stub.delay)
+
+                stub._deliver(mail_from, recipients, b"".join(lines))
+
+                self.reply("250 OK queued")
+
+            elif command == "NOOP":
+                self.reply("250 OK")
+
+            elif command == "RSET":
+                mail_from, recipients = None, []
+                self.reply("250 OK")
+
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+
+    daemon_threads = True
+
+    allow_reuse_address = True
+
+
+class SmtpStubServer:
+    """
+    Threaded local SMTP server. `delay` adds a pause to each DATA
+    command to mimic a slow relay.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0):
+
+        self.delay = delay
+
+        self.messages = []
+
+        self.connections = 0
+
+        self.logins = 0
+
+        self.lock = threading.Lock()
+
+        self.live = set()
+
+        self.server = _ThreadingServer((host, port), SmtpStubHandler)
+
+        self.server.stub = self
+
+        self.thread = None
+
+    @property
+    def host(self):
+
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+
+        return self.server.server_address[1]
+
+    def start(self):
+
+        self.thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True
+        )
+
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+
+        self.drop_connections()
+
+        self.server.shutdown()
+
+        self.server.server_close()
+
+    def drop_connections(self):
+        """
+        Close every open client session, as an idle timeout would.
+        """
+
+        with self.lock:
+            live = list(self.live)
+
+        for connection in live:
+            try:
+                connection.shutdown(2)
+            except OSError:
+                pass
+
+    def _register(self, connection):
+
+        with self.lock:
+            self.connections += 1
+            self.live.add(connection)
+
+    def _unregister(self, connection):
+
+        with self.lock:
+            self.live.discard(connection)
+
+    def _deliver(self, mail_from, recipients, data):
+
+        message = email.message_from_bytes(data, policy=policy.default)
+
+        with self.lock:
+            self.messages.append({
+                "from": mail_from,
+                "to": list(recipients),
+                "subject": message["Subject"],
+                "message": message,
+            })
@@ -0,0 +1,318 @@
+"""
+snapshot_store.py
+
+Append-only time-series store for portfolio snapshots.
+
+Holdings and positions are kept in SQLite tables with one column per
+field, keyed by snapshot time and instrument. Each snapshot only stores
+the rows that changed since the previous one (plus a tombstone row when
+an instrument disappears), and range queries read just the rows for the
+instrument and time window they need.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+DEFAULT_PATH = Path(__file__).resolve().parent / "data" / "portfolio_history.db"
+
+# table -> (key columns, value columns)
+TABLES = {
+    "holdings": (
+        ("exchange", "tradingsymbol"),
+        (
+            "instrument_token", "isin", "product", "quantity", "t1_quantity",
+            "average_price", "last_price", "close_price", "pnl",
+            "day_change", "day_change_percentage",
+        ),
+    ),
+    "positions": (
+        ("position_type", "exchange", "tradingsymbol", "product"),
+        (
+            "instrument_token", "quantity", "overnight_quantity", "multiplier",
+            "average_price", "last_price", "close_price", "value", "pnl",
+            "m2m", "unrealised", "realised", "buy_quantity", "buy_price",
+            "sell_quantity", "sell_price",
+        ),
+    ),
+}
+
+
+def _timestamp(value):
+
+    if value is None:
+        return time.time()
+
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.astimezone()
+        return value.timestamp()
+
+    return float(value)
+
+
+class SnapshotStore:
+
+    def __init__(self, path=None):
+
+        self.path = Path(path) if path else DEFAULT_PATH
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+
+        self.connection.execute("PRAGMA journal_mode=WAL")
+
+        self.lock = threading.Lock()
+
+        self._create_schema()
+
+    # ---------------------------------------------------
+
+    def close(self):
+
+        self.connection.close()
+
+    # ---------------------------------------------------
+
+    def _create_schema(self):
+
+        with self.connection:
+
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                "snapshot_id INTEGER PRIMARY KEY, "
+                "taken_at REAL NOT NULL UNIQUE)"
+            )
+
+            for table, (keys, values) in TABLES.items():
+
+                columns = ", ".join(
+                    [f"{name} TEXT NOT NULL" for name in keys]
+                    + [f"{name}" for name in values]
+                )
+
+                self.connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    f"taken_at REAL NOT NULL, {columns}, "
+                    f"deleted INTEGER NOT NULL DEFAULT 0, "
+                    f"PRIMARY KEY ({', '.join(keys)}, taken_at))"
+                )
+
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_symbol_time "
+                    f"ON {table} (tradingsymbol, taken_at)"
+                )
+
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_time ON {table} (taken_at)"
+                )
+
+    # ---------------------------------------------------
+
+    @staticmethod
+    def _rows(table, portfolio):
+        """
+        Flatten a portfolio section into {key tuple: value tuple}.
+        """
+
+        keys, values = TABLES[table]
+
+        section = portfolio.get(table)
+
+        if table == "positions":
+            items = [
+                dict(item, position_type=position_type)
+                for position_type in ("net", "day")
+                for item in (section or {}).get(position_type) or []
+            ]
+        else:
+            items = section or []
+
+        rows = {}
+
+        for item in items:
+            key = tuple(str(item.get(name) or "") for name in keys)
+            rows[key] = tuple(item.get(name) for name in values)
+
+        return rows
+
+    # ---------------------------------------------------
+
+    def _latest(self, table):
+        """
+        Current state of a table: latest non-deleted row per key.
+        """
+
+        keys, values = TABLES[table]
+
+        key_list = ", ".join(keys)
+
+        cursor = self.connection.execute(
+            f"SELECT {key_list}, {', '.join(values)}, deleted FROM {table} t "
+            f"WHERE taken_at = (SELECT MAX(taken_at) FROM {table} l "
+            f"WHERE {' AND '.join(f'l.{name} = t.{name}' for name in keys)})"
+        )
+
+        latest = {}
+
+        for row in cursor:
+            if not row[-1]:
+                latest[tuple(row[:len(keys)])] = tuple(row[len(keys):-1])
+
+        return latest
+
+    # ---------------------------------------------------
+
+    def append(self, portfolio, taken_at=None):
+        """
+        Store a portfolio snapshot, writing only the holdings and
+        positions rows that changed. Returns the number of rows written.
+        """
+
+        taken_at = _timestamp(taken_at)
+
+        written = 0
+
+        with self.lock, self.connection:
+
+            self.connection.execute(
+                "INSERT INTO snapshots (taken_at) VALUES (?)",
+                (taken_at,)
+            )
+
+            for table, (keys, values) in TABLES.items():
+
+                previous = self._latest(table)
+
+                current = self._rows(table, portfolio)
+
+                changed = [
+                    (taken_at, *key, *row, 0)
+                    for key, row in current.items()
+                    if previous.get(key) != row
+                ]
+
+                removed = [
+                    (taken_at, *key, *([None] * len(values)), 1)
+                    for key in previous
+                    if key not in current
+                ]
+
+                placeholders = ", ".join("?" * (len(keys) + len(values) + 2))
+
+                self.connection.executemany(
+                    f"INSERT INTO {table} (taken_at, {', '.join(keys)}, "
+                    f"{', '.join(values)}, deleted) VALUES ({placeholders})",
+                    changed + removed
+                )
+
+                written += len(changed) + len(removed)
+
+        return written
+
+    # ---------------------------------------------------
+
+    def snapshot_times(self, since=None, until=None):
+
+        cursor = self.connection.execute(
+            "SELECT taken_at FROM snapshots WHERE taken_at BETWEEN ? AND ? ORDER BY taken_at",
+            (_timestamp(since or 0), _timestamp(until))
+        )
+
+        return [datetime.fromtimestamp(row[0], timezone.utc) for row in cursor]
+
+    # ---------------------------------------------------
+
+    def holdings_at(self, when=None):
+        """
+        Holdings as they were at `when` (default: now), rebuilt
+        from the latest row per instrument at or before that time.
+        """
+
+        return self._state_at("holdings", _timestamp(when))
+
+    # ---------------------------------------------------
+
+    def positions_at(self, when=None):
+
+        return self._state_at("positions", _timestamp(when))
+
+    # ---------------------------------------------------
+
+    def _state_at(self, table, when):
+
+        keys, values = TABLES[table]
+
+        columns = list(keys) + list(values)
+
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(columns)}, deleted FROM {table} t "
+            f"WHERE taken_at = (SELECT MAX(taken_at) FROM {table} l "
+            f"WHERE {' AND '.join(f'l.{name} = t.{name}' for name in keys)} "
+            f"AND l.taken_at <= ?)",
+            (when,)
+        )
+
+        return [dict(zip(columns, row[:-1])) for row in cursor if not row[-1]]
+
+    # ---------------------------------------------------
+
+    def holding_history(self, tradingsymbol, since=None, until=None, exchange=None):
+        """
+        Change points of one holding in [since, until], each as
+        {"taken_at", "quantity", "average_price", "last_price", "value"}.
+        The row in effect at `since` is included as the first point, so
+        the series can be carried forward without loading snapshots.
+        """
+
+        since = _timestamp(since or 0)
+
+        until = _timestamp(until)
+
+        exchange_filter = " AND exchange = ?" if exchange else ""
+
+        exchange_args = (exchange,) if exchange else ()
+
+        cursor = self.connection.execute(
+            "SELECT taken_at, quantity, average_price, last_price, deleted "
+            "FROM holdings WHERE tradingsymbol = ?" + exchange_filter +
+            " AND taken_at <= ? AND taken_at >= COALESCE(("
+            "SELECT MAX(taken_at) FROM holdings WHERE tradingsymbol = ?" + exchange_filter +
+            " AND taken_at <= ?), ?) ORDER BY taken_at",
+            (tradingsymbol, *exchange_args, until, tradingsymbol, *exchange_args, since, since)
+        )
+
+        history = []
+
+        for taken_at, quantity, average_price, last_price, deleted in cursor:
+
+            if deleted:
+                quantity, last_price = 0, None
+
+            history.append({
+                "taken_at": datetime.fromtimestamp(max(taken_at, since), timezone.utc),
+                "quantity": quantity,
+                "average_price": average_price,
+                "last_price": last_price,
+                "value": (quantity or 0) * (last_price or 0),
+            })
+
+        return history
+
+    # ---------------------------------------------------
+
+    def holding_value(self, tradingsymbol, days=90, exchange=None):
+        """
+        [(time, value)] for a holding over the last `days` days.
+        """
+
+        since = time.time() - days * 86400
+
+        return [
+            (point["taken_at"], point["value"])
+            for point in self.holding_history(tradingsymbol, since=since, exchange=exchange)
+        ]
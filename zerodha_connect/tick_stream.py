@@ -0,0 +1,374 @@
+"""
+tick_stream.py
+
+Live tick streaming over the KiteTicker websocket.
+
+Ticks for every subscribed instrument are written into preallocated,
+array-backed ring buffers holding the last N ticks. The ticker thread
+is the only writer; readers never take a lock, they just read the
+slot the writer published last.
+"""
+
+import threading
+import time
+from array import array
+
+from kiteconnect import KiteTicker
+
+
+class TickRingBuffer:
+    """
+    Last `size` ticks (price, volume, timestamp) of one instrument.
+    Safe for one writer and any number of lock-free readers.
+    """
+
+    def __init__(self, size=1024):
+
+        self.size = size
+
+        self.prices = array("d", bytes(8 * size))
+
+        self.volumes = array("q", bytes(8 * size))
+
+        self.timestamps = array("d", bytes(8 * size))
+
+        # Total ticks written; the newest tick lives at (count - 1) % size.
+        self.count = 0
+
+    # ---------------------------------------------------
+
+    def append(self, price, volume, timestamp):
+
+        index = self.count % self.size
+
+        self.prices[index] = price
+
+        self.volumes[index] = volume
+
+        self.timestamps[index] = timestamp
+
+        # Publish only after the slot is fully written.
+        self.count += 1
+
+    # ---------------------------------------------------
+
+    def latest(self):
+        """
+        (price, volume, timestamp) of the newest tick, or None.
+        """
+
+        count = self.count
+
+        if not count:
+            return None
+
+        index = (count - 1) % self.size
+
+        return self.prices[index], self.volumes[index], self.timestamps[index]
+
+    # ---------------------------------------------------
+
+    def latest_price(self):
+
+        count = self.count
+
+        if not count:
+            return None
+
+        return self.prices[(count - 1) % self.size]
+
+    # ---------------------------------------------------
+
+    def snapshot(self):
+        """
+        Copy of the buffered ticks, oldest first, as
+        (prices, volumes, timestamps) lists.
+        """
+
+        count = self.count
+
+        filled = min(count, self.size)
+
+        start = count - filled
+
+        order = [(start + offset) % self.size for offset in range(filled)]
+
+        return (
+            [self.prices[i] for i in order],
+            [self.volumes[i] for i in order],
+            [self.timestamps[i] for i in order],
+        )
+
+
+class TickStream:
+    """
+    Subscribes to holdings and watchlist instruments on KiteTicker and
+    keeps their recent ticks in ring buffers.
+    """
+
+    def __init__(self, client, buffer_size=1024, mode=KiteTicker.MODE_QUOTE):
+
+        self.client = client
+
+        self.buffer_size = buffer_size
+
+        self.mode = mode
+
+        # instrument_token -> TickRingBuffer. Replaced, never mutated,
+        # so readers can use it without locking.
+        self.buffers = {}
+
+        # "EXCHANGE:TRADINGSYMBOL" -> instrument_token, and back
+        self.symbols = {}
+
+        self.token_symbols = {}
+
+        # Called with (instrument_token, price, timestamp) for every tick.
+        self.listeners = []
+
+        self.ticker = None
+
+        self.lock = threading.Lock()
+
+        self.connected = threading.Event()
+
+        self.reconnects = 0
+
+    # ---------------------------------------------------
+
+    def subscribe_holdings(self):
+        """
+        Stream every instrument currently in the holdings.
+        """
+
+        holdings = self.client.get_holdings()
+
+        self.subscribe({
+            f"{item['exchange']}:{item['tradingsymbol']}": item["instrument_token"]
+            for item in holdings
+        })
+
+    # ---------------------------------------------------
+
+    def subscribe_watchlist(self, symbols):
+        """
+        Stream a watchlist of "EXCHANGE:TRADINGSYMBOL" names,
+        resolving their instrument tokens through get_ltp.
+        """
+
+        ltp = self.client.get_ltp(list(symbols))
+
+        self.subscribe({
+            symbol: data["instrument_token"]
+            for symbol, data in ltp.items()
+        })
+
+    # ---------------------------------------------------
+
+    def subscribe(self, symbols):
+        """
+        Add {symbol: instrument_token} to the stream.
+        """
+
+        with self.lock:
+
+            buffers = dict(self.buffers)
+
+            added = []
+
+            for symbol, token in symbols.items():
+
+                token = int(token)
+
+                if token not in buffers:
+                    buffers[token] = TickRingBuffer(self.buffer_size)
+                    added.append(token)
+
+            self.symbols = {**self.symbols, **symbols}
+
+            self.token_symbols = {
+                **self.token_symbols,
+                **{int(token): symbol for symbol, token in symbols.items()}
+            }
+
+            self.buffers = buffers
+
+        if added and self.ticker is not None and self.ticker.is_connected():
+            self.ticker.subscribe(added)
+            self.ticker.set_mode(self.mode, added)
+
+    # ---------------------------------------------------
+
+    def add_listener(self, listener):
+        """
+        Call `listener(instrument_token, price, timestamp)` on the
+        ticker thread for every tick received.
+        """
+
+        with self.lock:
+            self.listeners = self.listeners + [listener]
+
+    # ---------------------------------------------------
+
+    def start(self, wait=None):
+        """
+        Connect the websocket on a background thread. Pass `wait`
+        seconds to block until the first connection is up.
+        """
+
+        self.ticker = KiteTicker(
+            self.client.config.API_KEY,
+            self.client.kite.access_token
+        )
+
+        self.ticker.on_ticks = self._on_ticks
+
+        self.ticker.on_connect = self._on_connect
+
+        self.ticker.on_close = self._on_close
+
+        self.ticker.on_reconnect = self._on_reconnect
+
+        self.ticker.on_noreconnect = self._on_noreconnect
+
+        self.ticker.connect(threaded=True)
+
+        if wait:
+            self.connected.wait(wait)
+
+    # ---------------------------------------------------
+
+    def stop(self):
+
+        if self.ticker is not None:
+
+            self.ticker.close()
+
+            self.ticker = None
+
+        self.connected.clear()
+
+    # ---------------------------------------------------
+
+    def _token(self, instrument):
+
+        if isinstance(instrument, str):
+            return self.symbols.get(instrument)
+
+        return instrument
+
+    # ---------------------------------------------------
+
+    def latest_price(self, instrument):
+        """
+        Last traded price for an instrument token or
+        "EXCHANGE:TRADINGSYMBOL", or None if no tick arrived yet.
+        """
+
+        buffer = self.buffers.get(self._token(instrument))
+
+        if buffer is None:
+            return None
+
+        return buffer.latest_price()
+
+    # ---------------------------------------------------
+
+    def latest_prices(self):
+        """
+        {symbol: last price} for every subscribed symbol with a tick.
+        """
+
+        buffers = self.buffers
+
+        prices = {}
+
+        for symbol, token in self.symbols.items():
+
+            buffer = buffers.get(token)
+
+            price = buffer.latest_price() if buffer is not None else None
+
+            if price is not None:
+                prices[symbol] = price
+
+        return prices
+
+    # ---------------------------------------------------
+
+    def history(self, instrument):
+        """
+        Buffered (prices, volumes, timestamps) for an instrument, oldest first.
+        """
+
+        buffer = self.buffers.get(self._token(instrument))
+
+        if buffer is None:
+            return [], [], []
+
+        return buffer.snapshot()
+
+    # ---------------------------------------------------
+
+    def _on_ticks(self, ws, ticks):
+
+        buffers = self.buffers
+
+        listeners = self.listeners
+
+        received = time.time()
+
+        for tick in ticks:
+
+            buffer = buffers.get(tick["instrument_token"])
+
+            if buffer is None:
+                continue
+
+            timestamp = tick.get("exchange_timestamp") or tick.get("last_trade_time")
+
+            timestamp = timestamp.timestamp() if timestamp else received
+
+            buffer.append(tick["last_price"], tick.get("volume_traded", 0), timestamp)
+
+            for listener in listeners:
+                try:
+                    listener(tick["instrument_token"], tick["last_price"], timestamp)
+                except Exception as error:
+                    # A bad listener must not cost the others (or the
+                    # ticker thread) this tick.
+                    print(f"Tick listener {listener!r} failed: {error!r}")
+
+    # ---------------------------------------------------
+
+    def _on_connect(self, ws, response):
+
+        # Subscribe on every (re)connect so tokens added while the
+        # socket was down are picked up as well.
+        tokens = list(self.buffers)
+
+        if tokens:
+            ws.subscribe(tokens)
+            ws.set_mode(self.mode, tokens)
+
+        self.connected.set()
+
+    # ---------------------------------------------------
+
+    def _on_close(self, ws, code, reason):
+
+        self.connected.clear()
+
+    # ---------------------------------------------------
+
+    def _on_reconnect(self, ws, attempts_count):
+
+        self.reconnects += 1
+
+        print(f"Tick stream reconnecting (attempt {attempts_count}).")
+
+    # ---------------------------------------------------
+
+    def _on_noreconnect(self, ws):
+
+        print("Tick stream gave up reconnecting.")
@@ -5,33 +5,80 @@ Handles reading and updating tokens stored in the .env file.
 """
 
 import os
+import threading
+from datetime import datetime, timezone
+
 from dotenv import dotenv_values
 
+from file_utils import atomic_write_text, file_lock
+
 
 class TokenManager:
     """
     Reads and updates ACCESS_TOKEN and REQUEST_TOKEN
     from the .env file.
+
+    Values are cached in memory and only re-read when the file's
+    mtime changes. Writes are atomic and guarded by a file lock, so
+    several processes can share the same .env safely.
     """
 
     def __init__(self, env_file=".env"):
         self.env_file = env_file
+        self.lock_file = f"{env_file}.lock"
+        self._cache = None
+        self._cache_mtime = None
+        self._lock = threading.Lock()
+
+    def _mtime(self):
+        """Change marker for .env: (mtime, size)"""
+        try:
+            stat = os.stat(self.env_file)
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
 
     def _read_env(self):
-        """Read all variables from .env"""
-        return dotenv_values(self.env_file)
+        """Read all variables from .env (cached on mtime)"""
+
+        mtime = self._mtime()
+
+        with self._lock:
+
+            if self._cache is None or mtime != self._cache_mtime:
+                self._cache = dict(dotenv_values(self.env_file))
+                self._cache_mtime = mtime
+
+            return dict(self._cache)
 
     def _write_env(self, values):
         """Write all variables back to .env"""
 
-        with open(self.env_file, "w") as file:
+        lines = []
+
+        for key, value in values.items():
+
+            if value is None:
+                value = ""
+
+            lines.append(f"{key}={value}\n")
+
+        atomic_write_text(self.env_file, "".join(lines))
+
+        with self._lock:
+            self._cache = dict(values)
+            self._cache_mtime = self._mtime()
+
+    def _update_env(self, **changes):
+        """Re-read, apply `changes` and write back under the file lock"""
+
+        with file_lock(self.lock_file):
 
-            for key, value in values.items():
+            data = self._read_env()
 
-                if value is None:
-                    value = ""
+            data.update(changes)
 
-                file.write(f"{key}={value}\n")
+            self._write_env(data)
 
     # ---------------------------------------------------
 
@@ -43,13 +90,32 @@ class TokenManager:
 
     # ---------------------------------------------------
 
-    def save_access_token(self, token):
+    def save_access_token(self, token, issued_at=None):
+        """
+        Store the access token together with the time it was issued
+        (now, unless given) so callers can tell when it expires.
+        """
 
-        data = self._read_env()
+        issued_at = issued_at or datetime.now(timezone.utc)
+
+        self._update_env(
+            ACCESS_TOKEN=token,
+            ACCESS_TOKEN_ISSUED_AT=issued_at.isoformat()
+        )
+
+    # ---------------------------------------------------
 
-        data["ACCESS_TOKEN"] = token
+    def get_access_token_issued_at(self):
 
-        self._write_env(data)
+        value = self._read_env().get("ACCESS_TOKEN_ISSUED_AT")
+
+        if not value:
+            return None
+
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
 
     # ---------------------------------------------------
 
@@ -63,23 +129,13 @@ class TokenManager:
 
     def save_request_token(self, token):
 
-        data = self._read_env()
-
-        data["REQUEST_TOKEN"] = token
-
-        self._write_env(data)
+        self._update_env(REQUEST_TOKEN=token)
 
     # ---------------------------------------------------
 
     def clear_tokens(self):
 
-        data = self._read_env()
-
-        data["ACCESS_TOKEN"] = ""
-
-        data["REQUEST_TOKEN"] = ""
-
-        self._write_env(data)
+        self._update_env(ACCESS_TOKEN="", ACCESS_TOKEN_ISSUED_AT="", REQUEST_TOKEN="")
 
     # ---------------------------------------------------
 
@@ -95,4 +151,4 @@ class TokenManager:
 
         token = self.get_request_token()
 
-        return bool(token)
\ No newline at end of file
+        return bool(token)
@@ -1,6 +1,7 @@
 import json
 from pathlib import Path
 
+from snapshot_store import SnapshotStore
 from zerodha_client import ZerodhaClient
 
 
@@ -23,6 +24,14 @@ def main():
     saved_path = client.save_portfolio_json(portfolio, output_path=output_path)
     print(f"Saved portfolio JSON to: {saved_path}")
 
+    # Keep the history: append the changed rows to the snapshot store
+    store = SnapshotStore()
+    try:
+        written = store.append(portfolio)
+    finally:
+        store.close()
+    print(f"Stored {written} changed rows in: {store.path}")
+
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,10 @@
 ## read the json file and get the tradingsymbol
-from pathlib import Path
 import json
-from typing import Dict, List, Union
+from pathlib import Path
+from typing import Dict, Iterator, List, Union
+
+from holdings_analytics import holdings_analytics, load_portfolio_cached, record_symbol
+from portfolio_io import iter_first_section_items
 
 
 output_dir = Path(__file__).resolve().parent / "data"
@@ -10,54 +13,64 @@ output_path = output_dir / "portfolio.json"
 ## get trading symbols from the json file along with last_price,average_price and difference between last_price and average_price in percentage
 def get_tradingsymbols_from_portfolio_json() -> List[Dict[str, Union[str, float]]]:
 
-    path = output_path
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_portfolio_cached(output_path, sections=("positions", "holdings"))
 
     if not isinstance(data, dict):
         return []
 
-    items = []
     positions = data.get("positions")
     holdings = data.get("holdings")
 
     if isinstance(positions, list) and positions:
-        items = positions
+        section = "positions"
     elif isinstance(holdings, list):
-        items = holdings
+        section = "holdings"
     elif isinstance(positions, list):
-        items = positions
-
-    if not isinstance(items, list):
+        section = "positions"
+    else:
         return []
 
-    result = []
-    for item in items:
-        if not isinstance(item, dict):
-            continue
+    analytics = holdings_analytics(output_path, section=section)
 
-        symbol = item.get("tradingsymbol") or item.get("trading_symbol")
-        if not isinstance(symbol, str):
+    return [
+        {
+            "tradingsymbol": symbol,
+            "last_price": last_price,
+            "average_price": average_price,
+            "difference_percentage": round(percentage_diff, 2),
+        }
+        for symbol, last_price, average_price, percentage_diff in zip(
+            analytics.symbols.tolist(),
+            analytics.last_price.tolist(),
+            analytics.average_price.tolist(),
+            analytics.pnl_percentage.tolist(),
+        )
+    ]
+
+## same rows as above, streamed one at a time while portfolio.json is still being read
+def iter_tradingsymbols_from_portfolio_json() -> Iterator[Dict[str, Union[str, float]]]:
+
+    for item in iter_first_section_items(output_path, ("positions", "holdings")):
+
+        symbol = record_symbol(item)
+
+        if symbol is None:
             continue
 
-        last_price = item.get("last_price")
-        average_price = item.get("average_price")
-
-        if not isinstance(last_price, (int, float)) or not isinstance(average_price, (int, float)):
-            continue
+        last_price = float(item["last_price"])
+        average_price = float(item["average_price"])
 
-        if average_price == 0:
-            percentage_diff = 0.0
-        else:
-            percentage_diff = round((last_price - average_price) / average_price, 2) * 100.0
+        percentage_diff = (last_price - average_price) / average_price * 100.0 if average_price else 0.0
 
-        result.append({
+        yield {
             "tradingsymbol": symbol,
-            "last_price": float(last_price),
-            "average_price": float(average_price),
-            "difference_percentage": percentage_diff,
-        })
+            "last_price": last_price,
+            "average_price": average_price,
+            "difference_percentage": round(percentage_diff, 2),
+        }
 
-    return result
 
+if __name__ == "__main__":
 
+    for row in iter_tradingsymbols_from_portfolio_json():
+        print(json.dumps(row), flush=True)
@@ -1,60 +1,16 @@
 import os
-import html
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
 from dotenv import load_dotenv
 
-load_dotenv()
-
-def generate_html_table(data):
-    if not isinstance(data, list) or not data:
-        return "<p>No data available to generate table.</p>"
-
-    first_row = data[0]
-
-    if isinstance(first_row, dict):
-        headers = list(first_row.keys())
-        rows = [
-            [item.get(key, "") if isinstance(item, dict) else "" for key in headers]
-            for item in data
-        ]
-    else:
-        rows = [
-            list(item) if isinstance(item, (list, tuple)) else [item]
-            for item in data
-        ]
-        headers = [f"Column {i + 1}" for i in range(len(rows[0]))]
-
-    table_html = """
-    <table style="border-collapse:collapse;width:100%;font-family:Arial,sans-serif;color:#333;">
-      <thead>
-        <tr style="background-color:#1f77b4;color:#fff;text-align:left;">
-    """
-
-    for header in headers:
-        table_html += (
-            f'<th style="padding:10px;border:1px solid #c8c8c8;">'
-            f"{html.escape(str(header))}</th>"
-        )
-
-    table_html += "</tr></thead><tbody>"
+from mail_dispatcher import get_dispatcher
+from report_renderer import render_table
 
-    for index, row in enumerate(rows):
-        row_style = "background-color:#f8f9fb;" if index % 2 else "background-color:#fff;"
-        table_html += f'<tr style="{row_style}">'
-
-        for cell in row:
-            table_html += (
-                '<td style="padding:10px;border:1px solid #c8c8c8;vertical-align:top;">'
-                f"{html.escape(str(cell))}</td>"
-            )
-
-        table_html += "</tr>"
+load_dotenv()
 
-    table_html += "</tbody></table>"
-    return table_html
+def generate_html_table(data, **options):
+    # Options (sort_by, descending, top, page, page_size, formats, ...)
+    # are passed through to report_renderer.render_table.
+    return render_table(data, **options)
 
 
 def get_required_env(name):
@@ -64,31 +20,34 @@ def get_required_env(name):
     return value
 
 
-def send_automail(data):
+def send_automail(data, wait=True):
+    # Blocks until the mail is delivered and raises if it was not;
+    # wait=False only queues it and returns the delivery Future.
     print("Process to send auto mail has started")
 
-    sender_email = get_required_env("EMAIL_SENDER")
+    # Fail early when the mail settings are missing
+    get_required_env("EMAIL_SENDER")
     receiver_email = get_required_env("EMAIL_RECEIVER")
-    email_password = get_required_env("EMAIL_PASSWORD")
-
-    smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
+    get_required_env("EMAIL_PASSWORD")
 
     subject = "[SP] Automated Mail - Zerodha Portfolio Data"
     plain_body = "New announcement about the Zerodha Portfolio Data"
     table_html = generate_html_table(data)
 
-    message = MIMEMultipart("alternative")
-    message["From"] = sender_email
-    message["To"] = receiver_email
-    message["Subject"] = subject
+    # Queued on the shared dispatcher, which reuses one SMTP session
+    future = get_dispatcher().send(subject, table_html, plain_body, to=receiver_email)
 
-    message.attach(MIMEText(plain_body, "plain"))
-    message.attach(MIMEText(table_html, "html"))
+    future.add_done_callback(_report_delivery)
 
-    with smtplib.SMTP(smtp_host, smtp_port) as server:
-        server.starttls()
-        server.login(sender_email, email_password)
-        server.send_message(message)
+    if wait:
+        future.result()
 
-    print("Email sent successfully.")
\ No newline at end of file
+    return future
+
+
+def _report_delivery(future):
+    error = future.exception()
+    if error is not None:
+        print(f"Email could not be sent: {error}")
+    else:
+        print(f"Email sent successfully in {future.result():.2f}s.")
@@ -6,36 +6,184 @@ Main Zerodha Client
 
 import csv
 import json
+import threading
 import time
 import webbrowser
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from urllib.parse import urlparse
 
 from kiteconnect import KiteConnect
+from kiteconnect.exceptions import TokenException
 
 from config import Config
+from metrics import get_metrics, response_hook, scheduler_samples, take_response_bytes
+from order_book import OrderBook
+from portfolio_export import write_flat_csv, write_parquet
+from portfolio_io import SUFFIXES, write_portfolio
 from auth_server import AuthServer
+from quote_cache import get_quote_cache
+from rate_limiter import PRIORITY_BULK, PRIORITY_INTERACTIVE, get_scheduler
+from resilience import CircuitOpenError, DeadlineExceeded, backoff_delay, breaker_samples, breaker_stats, get_circuit_breaker, is_transient
 from token_manager import TokenManager
 
 
+# Portfolio section -> client method that fetches it.
+PORTFOLIO_SECTIONS = {
+    "profile": "get_profile",
+    "holdings": "get_holdings",
+    "positions": "get_positions",
+    "orders": "get_orders",
+    "trades": "get_trades",
+    "funds": "get_funds",
+}
+
+# Instruments Kite accepts per quote / ltp request.
+QUOTE_BATCH_SIZE = 500
+
+LTP_BATCH_SIZE = 1000
+
+# Kite access tokens expire every day at 06:00 IST.
+IST = timezone(timedelta(hours=5, minutes=30))
+
+TOKEN_EXPIRY_HOUR = 6
+
+# Seconds to wait for the browser login redirect.
+LOGIN_TIMEOUT = 300
+
+# Hedging waits for this many latency samples of an endpoint before
+# trusting its p95 (Config.HEDGE_DELAY is used until then)...
+HEDGE_MIN_SAMPLES = 20
+
+# ...and never hedges sooner than this many seconds.
+HEDGE_MIN_DELAY = 0.05
+
+# Threads that run Kite requests, so callers can stop waiting at their
+# deadline and hedged duplicates can run alongside the first request.
+CALL_WORKERS = 32
+
+# Seconds allowed for the full instrument dump (several MB of CSV).
+INSTRUMENTS_DEADLINE = 120
+
+
+_call_executor = None
+
+_call_executor_lock = threading.Lock()
+
+# Marks the threads of the call pool (see _race).
+_pool_thread = threading.local()
+
+
+def _mark_pool_thread():
+
+    _pool_thread.active = True
+
+
+def get_call_executor():
+    """
+    The worker pool that runs Kite requests for every ZerodhaClient
+    in this process.
+    """
+
+    global _call_executor
+
+    with _call_executor_lock:
+
+        if _call_executor is None:
+            _call_executor = ThreadPoolExecutor(
+                max_workers=CALL_WORKERS,
+                thread_name_prefix="kite-call",
+                initializer=_mark_pool_thread
+            )
+
+        return _call_executor
+
+
+def token_expires_at(issued_at):
+    """
+    When an access token issued at `issued_at` stops working.
+    """
+
+    if issued_at.tzinfo is None:
+        issued_at = issued_at.replace(tzinfo=timezone.utc)
+
+    issued_ist = issued_at.astimezone(IST)
+
+    expiry = issued_ist.replace(hour=TOKEN_EXPIRY_HOUR, minute=0, second=0, microsecond=0)
+
+    if expiry <= issued_ist:
+        expiry += timedelta(days=1)
+
+    return expiry
+
+
 class ZerodhaClient:
 
-    def __init__(self):
+    def __init__(self, priority=PRIORITY_INTERACTIVE, root=None, login_uri=None, token_manager=None):
 
         self.config = Config()
 
-        self.token_manager = TokenManager()
+        self.token_manager = token_manager or TokenManager()
 
         self.kite = KiteConnect(
-            api_key=self.config.API_KEY
+            api_key=self.config.API_KEY,
+            root=root
         )
 
+        # Overrides the broker login page, e.g. with a local stand-in.
+        self.login_uri = login_uri
+
         self.server = None
 
+        # True while the session runs on a stored token that was trusted
+        # without a validation call; the first auth error re-logs in.
+        self.token_unverified = False
+
+        self.auth_lock = threading.Lock()
+
+        # Every Kite call waits its turn on the process-wide scheduler;
+        # background jobs should pass priority=PRIORITY_BULK.
+        self.scheduler = get_scheduler()
+
+        self.priority = priority
+
+        # get_ltp / get_quote are served from the shared quote cache.
+        self.quote_cache = get_quote_cache()
+
+        # Latency, errors and bytes per endpoint, plus cache and
+        # rate-limiter counters (see metrics.py).
+        self.metrics = get_metrics()
+
+        self.metrics.add_collector("quote_cache", self.quote_cache.stats)
+
+        self.metrics.add_collector("rate_limiter", self.scheduler.stats, scheduler_samples)
+
+        self.metrics.add_collector("circuit", breaker_stats, breaker_samples)
+
+        self.call_executor = get_call_executor()
+
+        if response_hook not in self.kite.reqsession.hooks["response"]:
+            self.kite.reqsession.hooks["response"].append(response_hook)
+
+        # Seconds spent per endpoint in the last get_personal_portfolio call.
+        self.portfolio_timings = {}
+
+        # Local order book used by sync_orders, opened on first use.
+        self.order_book = None
+
     # -----------------------------------------------------
 
-    def login(self):
+    def login(self, auth_server=None, open_url=None):
         """
         Authenticate the user and create a Kite session.
+
+        `auth_server` and `open_url` are passed on to the browser login
+        (see _authenticate) when a new token is needed.
+
+        A stored token issued before the next daily expiry is trusted
+        without a network round trip; it is only checked lazily, when
+        the first real API call fails with an auth error.
         """
 
         access_token = self.token_manager.get_access_token()
@@ -44,46 +192,78 @@ class ZerodhaClient:
 
             self.kite.set_access_token(access_token)
 
-            try:
-                self.kite.profile()
-                print("Using existing access token.")
-                return
+            issued_at = self.token_manager.get_access_token_issued_at()
+
+            now = datetime.now(timezone.utc)
+
+            if issued_at is not None:
+
+                if now < token_expires_at(issued_at):
+                    self.token_unverified = True
+                    print("Using existing access token.")
+                    return
 
-            except Exception:
                 print("Existing access token has expired.")
 
-        self._authenticate()
+            else:
+
+                try:
+                    self._call("default", self.kite.profile)
+
+                    # Valid right now, so it lives until the next expiry.
+                    self.token_manager.save_access_token(access_token, issued_at=now)
+
+                    print("Using existing access token.")
+                    return
+
+                except Exception:
+                    print("Existing access token has expired.")
+
+        self._authenticate(auth_server=auth_server, open_url=open_url)
 
     # -----------------------------------------------------
 
-    def _authenticate(self):
+    def _authenticate(self, auth_server=None, open_url=None, timeout=LOGIN_TIMEOUT):
+        """
+        Browser login. The callback server listens on REDIRECT_URL unless
+        an `auth_server` is given; `open_url` replaces webbrowser.open,
+        e.g. to drive the login headlessly.
+        """
 
-        self.server = AuthServer()
+        if auth_server is None:
+            redirect = urlparse(self.config.REDIRECT_URL)
+            auth_server = AuthServer(
+                host=redirect.hostname or "127.0.0.1",
+                port=redirect.port or 8000
+            )
+
+        self.server = auth_server
 
         self.server.start()
 
         print("Authentication server started.")
 
-        login_url = self.kite.login_url()
+        if self.login_uri:
+            login_url = f"{self.login_uri}?api_key={self.kite.api_key}&v={self.kite.kite_header_version}"
+        else:
+            login_url = self.kite.login_url()
 
         print("Opening browser...")
 
-        webbrowser.open(login_url)
+        (open_url or webbrowser.open)(login_url)
 
         print("Waiting for login...")
 
-        request_token = None
-
-        while request_token is None:
+        try:
+            request_token = self.server.wait_for_request_token(timeout)
+        finally:
+            self.server.stop()
 
-            request_token = self.server.get_request_token()
-
-            time.sleep(1)
+        if request_token is None:
+            raise TimeoutError(f"No login redirect received within {timeout} seconds.")
 
         print("Request token received.")
 
-        self.server.stop()
-
         self.token_manager.save_request_token(
             request_token
         )
@@ -105,57 +285,435 @@ class ZerodhaClient:
 
     # -----------------------------------------------------
 
-    def get_profile(self):
+    def _call(self, endpoint_class, fn, *args, priority=None, deadline=None, hedge=False):
+        """
+        Run a Kite call once the rate-limit scheduler allows it.
+
+        The call gives up with TimeoutError after `deadline` seconds
+        (default Config.CALL_DEADLINE), or with DeadlineExceeded if it
+        was still queued on the rate limiter. Transient upstream
+        failures are retried with jittered backoff while the deadline
+        allows, and fail fast with CircuitOpenError while the endpoint
+        class keeps failing.
+        With `hedge` (idempotent reads only) a duplicate request is sent
+        when the first has not answered within the endpoint's recent
+        p95 latency, and whichever answers first wins.
+        """
+
+        if priority is None:
+            priority = self.priority
+
+        if deadline is None:
+            deadline = self.config.CALL_DEADLINE
+
+        timeout = deadline
+
+        deadline = time.monotonic() + timeout
+
+        endpoint = getattr(fn, "__name__", endpoint_class)
+
+        breaker = get_circuit_breaker(endpoint_class, self.config.BREAKER_FAILURES, self.config.BREAKER_RESET)
+
+        token = self.kite.access_token
+
+        reauthenticated = False
+
+        attempt = 0
+
+        while True:
+
+            try:
+                breaker.before_call()
+
+            except CircuitOpenError:
+                self.metrics.count(endpoint, endpoint_class, "circuit_open")
+                raise
+
+            try:
+                result = self._race(endpoint, endpoint_class, fn, args, priority, deadline, hedge)
+
+            except DeadlineExceeded:
+                # Never left the rate-limit queue: not the upstream's fault.
+                breaker.release()
+                raise
+
+            except TokenException:
+
+                breaker.record_success()
+
+                if reauthenticated or (not self.token_unverified and self.kite.access_token == token):
+                    raise
+
+                # Log in again on the caller's thread, then retry with a
+                # fresh deadline; the login itself may take minutes.
+                self._reauthenticate(token)
+
+                reauthenticated = True
+
+                deadline = time.monotonic() + timeout
+
+                continue
+
+            except Exception as exc:
+
+                if not is_transient(exc):
+                    # The upstream answered; the request itself was bad.
+                    breaker.record_success()
+                    raise
+
+                breaker.record_failure()
+
+                attempt += 1
+
+                delay = backoff_delay(attempt, self.config.RETRY_BACKOFF, self.config.RETRY_BACKOFF_MAX)
+
+                if attempt > self.config.CALL_RETRIES or time.monotonic() + delay >= deadline:
+                    raise
+
+                self.metrics.count(endpoint, endpoint_class, "retry")
+
+                time.sleep(delay)
+
+                continue
+
+            breaker.record_success()
+
+            self.token_unverified = False
+
+            return result
+
+    # -----------------------------------------------------
+
+    def _race(self, endpoint, endpoint_class, fn, args, priority, deadline, hedge):
+        """
+        One attempt within the deadline, hedged if asked to. Requests
+        that lose the race or outlive the deadline finish in the
+        background and their answers are dropped.
+        """
+
+        sent = threading.Event()
+
+        if getattr(_pool_thread, "active", False) and not hedge:
+            # Already on a pool thread (a bulk batch): waiting for another
+            # one could starve the pool, so send from this thread.
+            return self._attempt(endpoint, endpoint_class, fn, args, priority, deadline, sent)
+
+        first = self.call_executor.submit(self._attempt, endpoint, endpoint_class, fn, args, priority, deadline, sent)
+
+        pending = {first}
+
+        if hedge:
+
+            delay = self.metrics.quantile(endpoint, self.config.HEDGE_QUANTILE, min_samples=HEDGE_MIN_SAMPLES)
+
+            delay = max(HEDGE_MIN_DELAY, self.config.HEDGE_DELAY if delay is None else delay)
+
+            # Time the hedge from when the request left, not from the
+            # rate-limit queue, where a duplicate would only queue too.
+            sent.wait(max(0.0, deadline - time.monotonic()))
+
+            done, _ = wait(pending, timeout=min(delay, max(0.0, deadline - time.monotonic())))
+
+            if not done and time.monotonic() < deadline:
+                self.metrics.count(endpoint, endpoint_class, "hedge")
+                pending.add(self.call_executor.submit(
+                    self._attempt, endpoint, endpoint_class, fn, args, priority, deadline
+                ))
+
+        error = None
+
+        while pending:
+
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                break
+
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+            for future in done:
+
+                if future.exception() is None:
+
+                    if future is not first:
+                        self.metrics.count(endpoint, endpoint_class, "hedge_win")
+
+                    return future.result()
+
+                error = future.exception()
+
+        if error is not None and not pending:
+            raise error
+
+        self.metrics.count(endpoint, endpoint_class, "deadline_exceeded")
+
+        if not sent.is_set():
+            raise DeadlineExceeded(f"Kite '{endpoint}' call was still queued on the rate limiter at its deadline.")
+
+        raise TimeoutError(f"Kite '{endpoint}' call did not answer before its deadline.")
+
+    # -----------------------------------------------------
+
+    def _attempt(self, endpoint, endpoint_class, fn, args, priority, deadline, sent=None):
+        """
+        Send one request, recording it in self.metrics. `sent` is set
+        once the rate limiter let the request go.
+        """
+
+        take_response_bytes()
+
+        call = {"waited": 0.0, "sent": sent}
+
+        error = None
+
+        started = time.perf_counter()
+
+        try:
+            return self._send(endpoint_class, fn, args, priority, deadline, call)
+
+        except Exception as exc:
+            error = type(exc).__name__
+            raise
+
+        finally:
+            self.metrics.observe(
+                endpoint,
+                endpoint_class,
+                time.perf_counter() - started,
+                error=error,
+                response_bytes=take_response_bytes(),
+                waited=call["waited"]
+            )
+
+    # -----------------------------------------------------
+
+    def _send(self, endpoint_class, fn, args, priority, deadline, call):
+
+        call["waited"] += self.scheduler.acquire(endpoint_class, priority)
+
+        # Queued past the deadline: nobody is waiting for the answer.
+        if time.monotonic() >= deadline:
+            raise DeadlineExceeded("Deadline passed while waiting for the rate limiter.")
+
+        if call["sent"] is not None:
+            call["sent"].set()
+
+        return fn(*args)
+
+    # -----------------------------------------------------
+
+    def _reauthenticate(self, stale_token):
+        """
+        Replace a trusted-but-expired token. Concurrent callers wait
+        for the first one to log in and then just retry.
+        """
+
+        with self.auth_lock:
+
+            if self.kite.access_token != stale_token:
+                return
+
+            print("Existing access token has expired.")
+
+            self.token_unverified = False
+
+            self._authenticate()
+
+    # -----------------------------------------------------
+
+    def get_profile(self, deadline=None):
 
-        return self.kite.profile()
+        return self._call("default", self.kite.profile, deadline=deadline, hedge=True)
 
     # -----------------------------------------------------
 
-    def get_holdings(self):
+    def get_holdings(self, deadline=None):
 
-        return self.kite.holdings()
+        return self._call("default", self.kite.holdings, deadline=deadline, hedge=True)
 
     # -----------------------------------------------------
 
-    def get_positions(self):
+    def get_positions(self, deadline=None):
 
-        return self.kite.positions()
+        return self._call("default", self.kite.positions, deadline=deadline, hedge=True)
 
     # -----------------------------------------------------
 
-    def get_orders(self):
+    def get_orders(self, deadline=None):
 
-        return self.kite.orders()
+        return self._call("order", self.kite.orders, deadline=deadline, hedge=True)
 
     # -----------------------------------------------------
 
-    def get_trades(self):
+    def get_trades(self, deadline=None):
 
-        return self.kite.trades()
+        return self._call("order", self.kite.trades, deadline=deadline, hedge=True)
 
     # -----------------------------------------------------
 
-    def get_funds(self):
+    def get_order_history(self, order_id, deadline=None):
 
-        return self.kite.margins()
+        return self._call("order", self.kite.order_history, order_id, deadline=deadline, hedge=True)
 
     # -----------------------------------------------------
 
-    def get_ltp(self, symbol):
+    def get_order_trades(self, order_id, deadline=None):
 
-        return self.kite.ltp(symbol)
+        return self._call("order", self.kite.order_trades, order_id, deadline=deadline, hedge=True)
 
     # -----------------------------------------------------
 
-    def get_quote(self, symbol):
+    def sync_orders(self, order_book=None):
+        """
+        Incrementally update an OrderBook (default: the one in
+        data/order_book.db) and return what changed; see order_book.py.
+        """
+
+        if order_book is None:
+            if self.order_book is None:
+                self.order_book = OrderBook()
+            order_book = self.order_book
 
-        return self.kite.quote(symbol)
+        return order_book.sync(self)
 
     # -----------------------------------------------------
 
-    def get_quotes(self, symbols):
+    def get_funds(self, deadline=None):
 
-        return self.kite.quote(symbols)
+        return self._call("default", self.kite.margins, deadline=deadline, hedge=True)
+
+    # -----------------------------------------------------
+
+    def get_instruments(self, exchange=None, deadline=None):
+
+        if deadline is None:
+            deadline = INSTRUMENTS_DEADLINE
+
+        return self._call("default", self.kite.instruments, exchange, deadline=deadline)
+
+    # -----------------------------------------------------
+
+    def get_historical_data(self, instrument_token, from_date, to_date, interval="day",
+                            continuous=False, oi=False, priority=None, deadline=None):
+        """
+        OHLCV candles for one instrument. Kite caps the date range per
+        request by interval; history_store splits longer ranges.
+        """
+
+        return self._call(
+            "historical",
+            self.kite.historical_data,
+            instrument_token, from_date, to_date, interval, continuous, oi,
+            priority=priority,
+            deadline=deadline
+        )
+
+    # -----------------------------------------------------
+
+    def get_ltp(self, symbol, deadline=None):
+
+        return self.quote_cache.get_many(
+            "ltp",
+            self._as_symbol_list(symbol),
+            lambda missing: self._call("quote", self.kite.ltp, missing, deadline=deadline, hedge=True)
+        )
+
+    # -----------------------------------------------------
+
+    def get_quote(self, symbol, deadline=None):
+
+        return self.quote_cache.get_many(
+            "quote",
+            self._as_symbol_list(symbol),
+            lambda missing: self._call("quote", self.kite.quote, missing, deadline=deadline, hedge=True)
+        )
+
+    # -----------------------------------------------------
+
+    @staticmethod
+    def _as_symbol_list(symbol):
+
+        if isinstance(symbol, (str, int)):
+            return [symbol]
+
+        return list(symbol)
+
+    # -----------------------------------------------------
+
+    def get_quotes(self, symbols, deadline=None):
+
+        symbols = self._as_symbol_list(symbols)
+
+        if len(symbols) > QUOTE_BATCH_SIZE:
+            return self.get_quotes_bulk(symbols, deadline=deadline)
+
+        return self._call("quote", self.kite.quote, symbols, deadline=deadline, hedge=True)
+
+    # -----------------------------------------------------
+
+    def get_quotes_bulk(self, symbols, batch_size=QUOTE_BATCH_SIZE, max_workers=4, deadline=None):
+        """
+        Full quotes for any number of symbols, fetched in
+        parallel batches of at most `batch_size` instruments.
+        """
+
+        return self._fetch_in_batches(self.kite.quote, symbols, batch_size, max_workers, deadline)
+
+    # -----------------------------------------------------
+
+    def get_ltp_bulk(self, symbols, batch_size=LTP_BATCH_SIZE, max_workers=4, deadline=None):
+        """
+        Lighter variant of get_quotes_bulk that only returns
+        instrument_token and last_price via kite.ltp.
+        """
+
+        return self._fetch_in_batches(self.kite.ltp, symbols, batch_size, max_workers, deadline)
+
+    # -----------------------------------------------------
+
+    def _fetch_in_batches(self, fetch, symbols, batch_size, max_workers, deadline=None):
+
+        # Drop duplicates but keep the caller's order.
+        symbols = list(dict.fromkeys(symbols))
+
+        batches = [
+            symbols[start:start + batch_size]
+            for start in range(0, len(symbols), batch_size)
+        ]
+
+        if not batches:
+            return {}
+
+        def fetch_batch(batch):
+            return self._call("quote", fetch, batch, priority=PRIORITY_BULK, deadline=deadline)
+
+        workers = max(1, min(max_workers, len(batches)))
+
+        # Batches run on the shared call pool, at most `workers` at a
+        # time so queued batches do not tie up its threads.
+        results = [None] * len(batches)
+
+        running = {}
+
+        submitted = 0
+
+        while submitted < len(batches) or running:
+
+            while submitted < len(batches) and len(running) < workers:
+                running[self.call_executor.submit(fetch_batch, batches[submitted])] = submitted
+                submitted += 1
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+        result = {}
+
+        for data in results:
+            result.update(data)
+
+        return result
 
     # -----------------------------------------------------
 
@@ -167,10 +725,28 @@ class ZerodhaClient:
 
     # -----------------------------------------------------
 
-    def save_portfolio_csv(self, portfolio, output_path=None):
+    def save_portfolio_csv(self, portfolio, output_path=None, mode="sections"):
         """
         Save portfolio payload to a CSV file in a local data folder.
+
+        mode="sections" writes the single section/key/value CSV.
+        mode="flat" writes one typed table per section (holdings,
+        positions_net, positions_day, orders, trades, funds) into the
+        `output_path` directory, and mode="parquet" does the same as
+        Parquet files. Those two return {table: path}.
         """
+        if mode in ("flat", "parquet"):
+            if output_path is None:
+                output_path = Path(__file__).resolve().parent / "data" / "portfolio_tables"
+
+            if mode == "parquet":
+                return write_parquet(portfolio, output_path)
+
+            return write_flat_csv(portfolio, output_path)
+
+        if mode != "sections":
+            raise ValueError(f"Unknown CSV export mode: {mode}")
+
         if output_path is None:
             output_path = Path(__file__).resolve().parent / "data" / "portfolio.csv"
         else:
@@ -199,39 +775,71 @@ class ZerodhaClient:
 
     # -----------------------------------------------------
 
-    def save_portfolio_json(self, portfolio, output_path=None):
+    def save_portfolio_json(self, portfolio, output_path=None, format=None):
         """
-        Save portfolio payload to a JSON file in a local data folder.
+        Save portfolio payload to a file in a local data folder.
+
+        `format` is one of portfolio_io.FORMATS ("json" compact JSON,
+        "json.gz", "json.zst" or "msgpack"); by default it follows the
+        file name. The file is streamed and replaced atomically.
         """
         if output_path is None:
-            output_path = Path(__file__).resolve().parent / "data" / "portfolio.json"
-        else:
-            output_path = Path(output_path)
+            suffix = SUFFIXES[format or "json"]
+            output_path = Path(__file__).resolve().parent / "data" / f"portfolio{suffix}"
 
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        output_path.write_text(json.dumps(portfolio, indent=2, default=str), encoding="utf-8")
-        return output_path
+        return write_portfolio(portfolio, output_path, format=format)
 
     # -----------------------------------------------------
 
-    def get_personal_portfolio(self):
+    def get_personal_portfolio(self, sections=None, max_workers=6, deadline=None, order_book=None):
         """
         Returns everything related to the account
         in a single dictionary.
+
+        The sections are fetched concurrently on a bounded thread pool.
+        Pass `sections` (e.g. ["holdings"]) to fetch only what you need.
+        `deadline` (seconds) applies to each endpoint call.
+        Per-endpoint timings are kept in `self.portfolio_timings`.
+
+        With an `order_book` (see sync_orders) the orders and trades
+        sections only hold what changed since its last sync; the full
+        book stays in the OrderBook.
         """
 
-        return {
+        if sections is None:
+            sections = list(PORTFOLIO_SECTIONS)
+
+        unknown = [name for name in sections if name not in PORTFOLIO_SECTIONS]
+
+        if unknown:
+            raise ValueError(f"Unknown portfolio sections: {', '.join(unknown)}")
 
-            "profile": self.get_profile(),
+        timings = {}
+
+        synced = [name for name in sections if order_book is not None and name in ("orders", "trades")]
+
+        def fetch(name):
+            started = time.perf_counter()
+            try:
+                if name == "order_book":
+                    return self.sync_orders(order_book)
+                return getattr(self, PORTFOLIO_SECTIONS[name])(deadline=deadline)
+            finally:
+                timings[name] = time.perf_counter() - started
 
-            "holdings": self.get_holdings(),
+        tasks = [name for name in sections if name not in synced] + (["order_book"] if synced else [])
 
-            "positions": self.get_positions(),
+        workers = max(1, min(max_workers, len(tasks)))
 
-            "orders": self.get_orders(),
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(fetch, name) for name in tasks}
+            results = {name: future.result() for name, future in futures.items()}
 
-            "trades": self.get_trades(),
+        portfolio = {
+            name: results["order_book"][name] if name in synced else results[name]
+            for name in sections
+        }
 
-            "funds": self.get_funds()
+        self.portfolio_timings = timings
 
-        }
\ No newline at end of file
+        return portfolio